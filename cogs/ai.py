@@ -1,47 +1,47 @@
 import discord
 from discord.ext import commands
-import google.generativeai as genai
-import edge_tts
 import config
 import os
 from utils import database
+from utils import tts
+from utils import ai_client
+from utils.chat_sessions import ChatSessions
+from utils import memory_index
 from PIL import Image
 import io
 import aiohttp
-import uuid
 from utils.logger import setup_logger
 
 logger = setup_logger("AICog")
 
-# Configurar el modelo
-genai.configure(api_key=config.GEMINI_KEY)
+# Configuración del modelo (la instancia la comparte utils/ai_client)
 generation_config = {
   "temperature": config.AI_TEMPERATURE,
 }
-model = genai.GenerativeModel(config.AI_MODEL, generation_config=generation_config)
-# Chat session removed from global scope
 
 class AI(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.sessions = {} # {id: chat_session} - ID can be guild_id (Server) or user_id (DM)
+        # Sesiones por ID (guild_id en servidores, user_id en DM): LRU + TTL, historial recortado y persistido
+        self.sessions = ChatSessions(
+            max_sessions=config.CHAT_SESSION_MAX,
+            idle_ttl=config.CHAT_SESSION_IDLE_TTL,
+            context_tokens=config.CHAT_SESSION_CONTEXT_TOKENS,
+            transcript_max=config.CHAT_SESSION_TRANSCRIPT_MAX,
+            generation_config=generation_config
+        )
         # Asegurar directorio temporal
         os.makedirs('temp', exist_ok=True)
 
-    def get_session(self, ctx):
-        """Obtiene o crea una sesión de chat para el servidor/usuario actual."""
-        session_id = ctx.guild.id if ctx.guild else ctx.author.id
-        
-        if session_id not in self.sessions:
-            self.sessions[session_id] = model.start_chat(history=[])
-            logger.info(f"Creada nueva sesión de IA para ID: {session_id}")
-            
-        return self.sessions[session_id]
+    def session_id(self, ctx):
+        """ID de la sesión de chat para el servidor/usuario actual."""
+        return ctx.guild.id if ctx.guild else ctx.author.id
 
     async def generate_greeting_audio(self, user, prompt_override=None):
         """Genera un saludo de audio para el usuario y devuelve la ruta del archivo."""
         try:
-            memories = database.get_memory(user.id)
+            # Sin pregunta: los datos más recientes
+            memories = memory_index.relevant(user.id)
             contexto = ""
             if memories:
                 contexto = f"Sabes esto de él: {', '.join(memories)}."
@@ -58,21 +58,14 @@ class AI(commands.Cog):
             # Generar Texto
             if prompt_override and "chat_session" in prompt_override: # Hacky logic check? No, just use model for one-off
                  # Use chat session for continuity if needed, but greeting is one-off
-                 response = await model.generate_content_async(prompt)
+                 response = await ai_client.generate(prompt, generation_config=generation_config, priority=ai_client.PRIORITY_GREETING)
             else:
-                 response = await model.generate_content_async(prompt)
+                 response = await ai_client.generate(prompt, generation_config=generation_config, priority=ai_client.PRIORITY_GREETING)
 
             saludo = response.text.strip().replace("*", "")
             
-            # Generar Audio
-            filename = f"temp/greeting_{uuid.uuid4().hex}.mp3"
-            communicate = edge_tts.Communicate(
-                saludo, 
-                config.TTS_VOICE, 
-                rate=config.TTS_RATE, 
-                pitch=config.TTS_PITCH
-            )
-            await communicate.save(filename)
+            # Generar Audio (cache de TTS: archivo único por contenido)
+            filename = await tts.synthesize(saludo)
             
             return filename, saludo
             
@@ -109,7 +102,7 @@ class AI(commands.Cog):
         async with ctx.typing():
             try:
                 # Recuperar memoria
-                memories = database.get_memory(ctx.author.id)
+                memories = memory_index.relevant(ctx.author.id, pregunta)
                 contexto_memoria = ""
                 if memories:
                     contexto_memoria = "Lo que sabes de este usuario:\n" + "\n".join(f"- {m}" for m in memories)
@@ -129,8 +122,9 @@ class AI(commands.Cog):
 
                 prompt_completo = f"Eres Asuka, un bot de música útil y sarcástico. {contexto_memoria}{contexto_historico}{contexto_musica}\nUsuario: {pregunta}\nResponde brevemente:"
                 
-                session = self.get_session(ctx)
-                response = await session.send_message_async(prompt_completo)
+                # Al historial solo pasa la pregunta; el contexto (memoria, gustos, canción) se envía fresco cada vez
+                response = await self.sessions.send(self.session_id(ctx), prompt_completo,
+                                                    user_text=f"{ctx.author.display_name}: {pregunta}")
                 texto = response.text
                 
                 if len(texto) > 1900:
@@ -144,7 +138,9 @@ class AI(commands.Cog):
     @commands.command()
     async def recuerda(self, ctx, *, dato):
         """Asuka recordará esto sobre ti."""
-        database.add_memory(ctx.author.id, dato)
+        saved, existing = memory_index.remember(ctx.author.id, dato)
+        if not saved:
+            return await ctx.send(f"🧠 **Ya lo sabía:** {existing}")
         await ctx.send(f"🧠 **Memorizado:** {dato}")
 
     @commands.command(aliases=['mira'])
@@ -168,7 +164,7 @@ class AI(commands.Cog):
                 image = Image.open(io.BytesIO(img_data))
                 
                 prompt = f"Eres Asuka. Comenta esta imagen con tu personalidad sarcástica. Usuario dice: {pregunta}"
-                response = await model.generate_content_async([prompt, image])
+                response = await ai_client.generate([prompt, image], generation_config=generation_config)
                 
                 await ctx.send(f"👀 {response.text}")
             except Exception as e:
@@ -181,7 +177,7 @@ class AI(commands.Cog):
             
             try:
                 # Recuperar memoria musical
-                memories = database.get_memory(ctx.author.id)
+                memories = memory_index.relevant(ctx.author.id, mood)
                 contexto_memoria = ""
                 if memories:
                     contexto_memoria = "Toma en cuenta esto que sabes del usuario:\n" + "\n".join(f"- {m}" for m in memories)
@@ -193,7 +189,7 @@ class AI(commands.Cog):
                     "Responde SOLO el nombre, sin comillas."
                 )
                 
-                response = await model.generate_content_async(prompt_dj)
+                response = await ai_client.generate(prompt_dj, generation_config=generation_config)
                 cancion_elegida = response.text.strip()
                 
                 await ctx.send(f"💡 **Elegí:** {cancion_elegida}. Agregando...")
@@ -220,7 +216,7 @@ class AI(commands.Cog):
         async with ctx.typing():
             try:
                 # Recuperar memoria para personalizar el saludo
-                memories = database.get_memory(ctx.author.id)
+                memories = memory_index.relevant(ctx.author.id, pregunta)
                 contexto_memoria = ""
                 if memories:
                     contexto_memoria = "Sabes esto de él: " + ", ".join(memories) + "."
@@ -241,27 +237,17 @@ class AI(commands.Cog):
                     # Caso: Pregunta normal
                     prompt = f"Eres Asuka. Responde a esto de forma corta y charlada (máximo 2 frases): {pregunta}. {contexto_memoria}"
 
-                session = self.get_session(ctx)
-                response = await session.send_message_async(prompt)
+                user_text = f"{ctx.author.display_name}: {pregunta}" if pregunta else f"({ctx.author.display_name} te invocó al canal de voz)"
+                response = await self.sessions.send(self.session_id(ctx), prompt, user_text=user_text)
                 texto_respuesta = response.text.replace("*", "")
                 
                 await ctx.send(f"🗣️ **Diciendo:** {texto_respuesta}")
 
-                communicate = edge_tts.Communicate(
-                    texto_respuesta, 
-                    config.TTS_VOICE, 
-                    rate=config.TTS_RATE, 
-                    pitch=config.TTS_PITCH
-                )
-                
-                # Usar archivo temporal en el directorio actual
-                archivo_audio = "temp/respuesta.mp3"
-                await communicate.save(archivo_audio)
-
                 if ctx.voice_client.is_playing():
                     ctx.voice_client.stop()
                     
-                source = discord.FFmpegPCMAudio(archivo_audio)
+                # TTS en streaming: empieza a sonar con el primer chunk (y queda en la cache de TTS)
+                source = discord.FFmpegPCMAudio(tts.TTSPipe(texto_respuesta), pipe=True)
                 ctx.voice_client.play(source)
 
             except Exception as e:
@@ -282,20 +268,10 @@ class AI(commands.Cog):
 
         async with ctx.typing():
             try:
-                communicate = edge_tts.Communicate(
-                    text, 
-                    config.TTS_VOICE, 
-                    rate=config.TTS_RATE, 
-                    pitch=config.TTS_PITCH
-                )
-                
-                archivo_audio = "temp/tts_output.mp3"
-                await communicate.save(archivo_audio)
-
                 if ctx.voice_client.is_playing():
                     ctx.voice_client.stop()
                     
-                source = discord.FFmpegPCMAudio(archivo_audio)
+                source = discord.FFmpegPCMAudio(tts.TTSPipe(text), pipe=True)
                 ctx.voice_client.play(source)
                 await ctx.send(f"🗣️ **Diciendo:** {text}")
 
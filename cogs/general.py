@@ -4,6 +4,8 @@ import psutil
 import os
 import time
 from utils import database
+from utils import ai_client
+from utils import memory_index
 from utils.logger import setup_logger
 
 logger = setup_logger("GeneralCog")
@@ -149,6 +151,41 @@ class General(commands.Cog):
         embed.add_field(name="🧠 Uso de CPU", value=f"**{cpu_usage}%**", inline=True)
         embed.add_field(name="💾 RAM Usada", value=f"**{memory.percent}%**\n({int(memory.used/1024/1024)}MB de {int(memory.total/1024/1024)}MB)", inline=True)
         embed.add_field(name="🐧 Sistema", value="Linux", inline=False)
+
+        # Caches de música (hits/misses)
+        music_cog = self.bot.get_cog('Music')
+        if music_cog:
+            lines = []
+            for name, st in music_cog.core.cache_stats().items():
+                lines.append(f"`{name}`: {st['size']} entradas | {int(st['hit_rate'] * 100)}% hits ({st['hits']}/{st['hits'] + st['misses']})")
+            embed.add_field(name="🗃️ Caches", value="\n".join(lines) or "Sin datos", inline=False)
+
+            ex = music_cog.core.extractor.stats()
+            embed.add_field(name="⛏️ Extracción", value=f"{ex['pending']}/{ex['max_pending']} en curso | {ex['workers']} workers ({ex['backend']}) | {ex['avg_ms']}ms media | {ex['rejected']} rechazadas", inline=False)
+
+        ai = ai_client.stats()
+        sched = ai['scheduler']
+        shed = sum(sched[name]['shed'] for name in ("interactive", "greeting", "background"))
+        embed.add_field(name="🤖 Gemini", value=(
+            f"{ai['calls']} llamadas | {ai['avg_ms']}ms media | {ai['errors']} errores ({ai['timeouts']} timeouts) | {ai['retries']} reintentos\n"
+            f"Cola: {sched['queued']} esperando | {shed} descartadas | {sched['backoffs']} pausas por 429 | "
+            f"espera media: chat {sched['interactive']['avg_wait_ms']}ms, radio {sched['background']['avg_wait_ms']}ms"
+        ), inline=False)
+
+        ai_cog = self.bot.get_cog('AI')
+        if ai_cog:
+            ses = ai_cog.sessions.stats()
+            embed.add_field(name="💬 Sesiones de chat", value=(
+                f"{ses['sessions']}/{ses['max_sessions']} activas | {ses['rehydrated']} rehidratadas | "
+                f"{ses['evicted']} expulsadas (LRU) | {ses['expired']} expiradas\n"
+                f"Prompt medio: ~{ses['avg_prompt_tokens']} tokens (máx ~{ses['max_prompt_tokens']}) en {ses['turns']} turnos"
+            ), inline=False)
+
+        mem = memory_index.get_memory_index().stats()
+        embed.add_field(name="🧠 Memoria", value=(
+            f"{mem['users']} usuarios indexados | {mem['queries']} consultas | {mem['duplicates']} duplicados evitados | "
+            f"datos por prompt: {mem['avg_facts_sent']} de {mem['avg_facts_stored']} guardados"
+        ), inline=False)
         embed.set_footer(text="¡Sigo viva!")
         await ctx.send(embed=embed)
 
@@ -89,6 +89,19 @@ class MusicControlView(discord.ui.View):
         else:
              await interaction.response.send_message("❌ Nada sonando.", ephemeral=True)
 
+# Eventos del reproductor por servidor
+EVENT_TRACK_FINISHED = "TRACK_FINISHED" # Callback `after` de discord.py
+EVENT_ENQUEUE = "ENQUEUE"               # Se añadió algo a la cola
+EVENT_SKIP = "SKIP"                     # !skip / botón
+EVENT_RADIO_READY = "RADIO_READY"       # La radio terminó de preparar su siguiente canción
+
+class GuildPlayer:
+    """Reproductor de un servidor: un task asyncio que consume eventos de su cola."""
+    def __init__(self, ctx):
+        self.ctx = ctx # Último ctx (canal para mensajes / requester)
+        self.events = asyncio.Queue()
+        self.task = None
+
 class Music(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -97,10 +110,23 @@ class Music(commands.Cog):
         self.current_song_info = {} # {guild_id: {'start_time': 0, 'duration': 0, 'title': 'name'}}
         self.radio_active = {} # {guild_id: bool or string}
         self.radio_processing = set() # {guild_id} to prevent race conditions
+        self.radio_generation = {} # {guild_id: int} - Sube al cambiar de estación (invalida lotes en vuelo)
         self.radio_session_start = set() # Set of guild_ids that just started radio (for First Song Intro)
         self.announcer_mode = {} # {guild_id: "FULL"|"TEXT"|"MUTE"}
         self.now_playing_messages = {} # {guild_id: discord.Message}
         self.volumes = {} # {guild_id: float} - Volume per server
+        self.play_requested_at = {} # {guild_id: perf_counter} - Para medir time-to-first-audio de !play
+        self.prefetch_running = set() # {guild_id} con pipeline de prefetch activo
+        self.prefetch_dirty = set() # {guild_id} cuya cola cambió durante el prefetch (repetir)
+        self.players = {} # {guild_id: GuildPlayer}
+        self.warm_sources = {} # {guild_id: (queue_item, (source, title, duration, error))} - Siguiente fuente pre-calentada
+        self.prewarm_tasks = {} # {guild_id: asyncio.Task}
+
+    async def cog_unload(self):
+        for guild_id in list(self.players):
+            self._stop_player(guild_id)
+        # Sin esto los workers de extracción (backend 'process') sobreviven al bot
+        self.core.extractor.shutdown()
 
     def _unwrap_queue_item(self, item):
         """Desempaqueta items de radio candidato."""
@@ -110,8 +136,58 @@ class Music(commands.Cog):
             is_radio_prefetch = True
         return item, is_radio_prefetch
 
-    def _handle_intro(self, ctx, item):
-        """Maneja Intros de TTS. Retorna True si se reprodujo algo (interrumpiendo flujo normal)."""
+    # --- Player Engine ---
+    # Un task asyncio por servidor consume eventos de su GuildPlayer. El callback `after=` de discord.py
+    # (hilo de audio) solo encola TRACK_FINISHED en el loop: nada bloquea ni toca la cola desde otro hilo.
+
+    def _get_player(self, ctx):
+        """Obtiene (o arranca) el reproductor del servidor. Actualiza el ctx usado para mensajes."""
+        player = self.players.get(ctx.guild.id)
+        if player is None or player.task is None or player.task.done():
+            player = GuildPlayer(ctx)
+            player.task = asyncio.create_task(self._player_loop(player))
+            self.players[ctx.guild.id] = player
+        player.ctx = ctx
+        return player
+
+    def _notify(self, ctx, event):
+        """Envía un evento al reproductor del servidor (solo desde el loop)."""
+        self._get_player(ctx).events.put_nowait(event)
+
+    def _after_callback(self, ctx):
+        """Callback `after=` para vc.play(): corre en el hilo de audio, así que solo salta al loop."""
+        guild_id = ctx.guild.id
+        def after(error):
+            if error:
+                logger.error(f"Error en reproducción ({guild_id}): {error}")
+            player = self.players.get(guild_id)
+            if player:
+                self.bot.loop.call_soon_threadsafe(player.events.put_nowait, EVENT_TRACK_FINISHED)
+        return after
+
+    def _stop_player(self, guild_id):
+        self._discard_warm_source(guild_id)
+        player = self.players.pop(guild_id, None)
+        if player and player.task:
+            player.task.cancel()
+
+    async def _player_loop(self, player):
+        guild_id = player.ctx.guild.id
+        while True:
+            event = await player.events.get()
+            try:
+                vc = player.ctx.voice_client
+                if not vc or not vc.is_connected():
+                    continue
+                # ENQUEUE / RADIO_READY con algo sonando: no hay nada que hacer todavía
+                if vc.is_playing() or vc.is_paused():
+                    continue
+                await self._play_next(player.ctx)
+            except Exception as e:
+                logger.error(f"Error en player loop ({guild_id}, {event}): {e}")
+
+    async def _play_intro(self, ctx, item):
+        """Maneja Intros de TTS. Retorna True si quedó sonando algo."""
         if item[0] == "INTRO":
             # ("INTRO", file_path, intro_text)
             file_path = item[1]
@@ -119,30 +195,30 @@ class Music(commands.Cog):
             try:
                 # 20% más volumen para la voz
                 source = discord.PCMVolumeTransformer(discord.FFmpegPCMAudio(file_path), volume=config.DEFAULT_VOLUME * 1.2)
-                ctx.voice_client.play(source, after=lambda e: self.check_queue(ctx))
+                ctx.voice_client.play(source, after=self._after_callback(ctx))
                 # Enviar texto visual también
-                asyncio.run_coroutine_threadsafe(ctx.send(f"🎙️ **Asuka:** *{intro_text}*"), self.bot.loop)
+                asyncio.create_task(ctx.send(f"🎙️ **Asuka:** *{intro_text}*"))
+                return True
             except Exception as e:
                 logger.error(f"Error playing intro: {e}")
-                self.check_queue(ctx)
-            return True
+                return False
 
         elif item[0] == "TEXT_INTRO":
-            # ("TEXT_INTRO", intro_text)
+            # ("TEXT_INTRO", intro_text) -> Solo texto, se pasa al siguiente item
             intro_text = item[1]
-            asyncio.run_coroutine_threadsafe(ctx.send(f"🎙️ **Asuka:** *{intro_text}*"), self.bot.loop)
-            # Pasar inmediatamente al siguiente item
-            self.check_queue(ctx)
-            return True
+            asyncio.create_task(ctx.send(f"🎙️ **Asuka:** *{intro_text}*"))
         
         return False
 
-    def _create_audio_source(self, ctx, item):
+    async def _create_audio_source(self, ctx, item):
         """
         Transforma un item de cola en una fuente de audio reproducible.
-        Retorna: (source, title, duration, is_error)
+        Retorna: (source, title, duration, is_error, play)
+        play = (video_id, title, duration) para audio_cache.record_play(): se cuenta al empezar a sonar
+        (en _play_next), no aquí, porque una fuente pre-calentada puede descartarse sin reproducirse.
         """
         source = None
+        play = None
         title = "Desconocido"
         duration = 0
         
@@ -171,69 +247,137 @@ class Music(commands.Cog):
             if len(item) > 3: duration = item[3]
             
             # --- LAZY RESOLUTION ---
-            # Si es un link de YouTube (watch), necesitamos resolverlo a stream
-            if "youtube.com/watch" in url or "youtu.be/" in url:
-                try:
-                    # logger.info(f"Resolving stream for {title}...")
-                    data = asyncio.run_coroutine_threadsafe(self.core.get_stream_url(url), self.bot.loop).result()
-                    if data and 'url' in data:
-                        url = data['url'] # Actualizar a Stream URL
-                        # Opcional: Actualizar thumbnail/duration si faltaban
-                except Exception as e:
-                    logger.error(f"Error resolving stream lazy: {e}")
-                    return None, title, 0, True
+            # Si es un link de YouTube (watch), necesitamos resolverlo a stream (normalmente ya está en cache)
+            acodec = None
+            local = False
+            if self._is_youtube_url(url):
+                cached = self.core.local_audio(url)
+                if cached:
+                    # Archivo Opus en disco: ni extracción ni stream remoto
+                    url, acodec, local = cached['path'], "opus", True
+                    play = (cached['video_id'], None, None)
+                else:
+                    try:
+                        data = await self.core.get_stream_url(url)
+                        if data and 'url' in data:
+                            url = data['url'] # Actualizar a Stream URL
+                            acodec = data.get('acodec')
+                            play = (data.get('id'), data.get('title'), data.get('duration'))
+                            # Opcional: Actualizar thumbnail/duration si faltaban
+                    except Exception as e:
+                        logger.error(f"Error resolving stream lazy: {e}")
+                        return None, title, 0, True, None
 
             try:
-                source = discord.PCMVolumeTransformer(discord.FFmpegPCMAudio(url, **ffmpeg_options), volume=vol)
+                source = self._build_stream_source(url, vol, acodec, local=local)
             except Exception as e:
                 logger.error(f"Error creating source from URL {title}: {e}")
-                return None, title, 0, True
+                return None, title, 0, True, None
         
         elif item[0] == "PENDING_SEARCH":
             query = item[1]
+            cached = self.core.local_audio(query)
+            if cached:
+                try:
+                    source = self._build_stream_source(cached['path'], vol, "opus", local=True)
+                except Exception as e:
+                    logger.error(f"Error creating source from cache {query}: {e}")
+                    return None, query, 0, True, None
+                return source, cached['title'] or query, cached['duration'] or 0, False, (cached['video_id'], None, None)
+
             try:
                 # Usar Core para resolver
-                data = asyncio.run_coroutine_threadsafe(self.core.get_stream_url(query), self.bot.loop).result()
+                data = await self.core.get_stream_url(query)
                 
                 if not data:
                      logger.error(f"Error resolving {query}: No data")
-                     return None, query, 0, True
+                     return None, query, 0, True, None
 
                 url = data['url']
                 title = data['title']
-                source = discord.PCMVolumeTransformer(discord.FFmpegPCMAudio(url, **ffmpeg_options), volume=vol)
+                duration = data.get('duration') or 0
+                source = self._build_stream_source(url, vol, data.get('acodec'))
+                play = (data.get('id'), title, duration)
             except Exception as e:
                 logger.error(f"Error searching {query}: {e}")
-                return None, query, 0, True
+                return None, query, 0, True, None
 
-        return source, title, duration, False
+        return source, title, duration, False, play
 
-    def check_queue(self, ctx):
-        if ctx.guild.id in self.queues and self.queues[ctx.guild.id]:
+    def _build_stream_source(self, url, vol, acodec=None, local=False):
+        """
+        Crea la fuente de audio para un stream remoto (o un archivo de la cache de audio si local=True).
+        - Modo "pcm": FFmpeg -> PCM -> volumen en Python -> libopus (clásico).
+        - Modo "opus": FFmpegOpusAudio. Con volumen por defecto y stream Opus (itag 251) se copia el
+          codec tal cual (sin decodificar ni re-codificar). Con otro volumen, ffmpeg aplica un filtro
+          'volume' y codifica a Opus él mismo: nada de escalar frames en el loop de Python.
+        """
+        # Los -reconnect son solo para HTTP
+        base_opts = {'options': ffmpeg_options.get('options', '-vn')} if local else ffmpeg_options
+
+        if config.PLAYBACK_MODE != "opus":
+            return discord.PCMVolumeTransformer(discord.FFmpegPCMAudio(url, **base_opts), volume=vol)
+
+        if vol == config.DEFAULT_VOLUME and acodec == "opus":
+            return discord.FFmpegOpusAudio(url, codec="copy", **base_opts)
+
+        # El volumen por defecto equivale al nivel original del stream
+        gain = vol / config.DEFAULT_VOLUME if config.DEFAULT_VOLUME else vol
+        opts = dict(base_opts)
+        opts['options'] = f"{opts.get('options', '')} -filter:a volume={gain:.2f}".strip()
+        return discord.FFmpegOpusAudio(url, **opts)
+
+    async def _play_next(self, ctx):
+        """Saca items de la cola hasta que uno suene. Si la cola se vacía, pide radio (si está activa)."""
+        guild_id = ctx.guild.id
+        while self.queues.get(guild_id):
             # Recuperar item de la cola
-            item = self.queues[ctx.guild.id].pop(0)
+            queue_item = self.queues[guild_id].pop(0)
             
             # 1. Desempaquetar
-            item, is_radio_prefetch = self._unwrap_queue_item(item)
+            item, is_radio_prefetch = self._unwrap_queue_item(queue_item)
             
             # 2. Manejar Intros
-            if self._handle_intro(ctx, item):
-                return
+            if item[0] in ["INTRO", "TEXT_INTRO"]:
+                if await self._play_intro(ctx, item):
+                    # La intro es corta: calentar ya la canción que viene
+                    self._schedule_prewarm(ctx, 0)
+                    return
+                continue
 
-            # 3. Crear Audio Source
-            source, title, duration, error = self._create_audio_source(ctx, item)
+            # 3. Crear Audio Source (o usar la pre-calentada si es este mismo item)
+            warm = self._take_warm_source(guild_id, queue_item)
+            if warm:
+                source, title, duration, error, play = warm
+            else:
+                source, title, duration, error, play = await self._create_audio_source(ctx, item)
             
             if error or not source:
                 # Si falló, pasamos al siguiente
-                self.check_queue(ctx)
+                continue
+
+            # Alguien puso audio (ej: !tts) o nos desconectaron mientras resolvíamos: devolver a la cola
+            if not ctx.voice_client or ctx.voice_client.is_playing():
+                source.cleanup()
+                self.queues[guild_id].insert(0, queue_item)
                 return
 
             # 4. Reproducir
-            ctx.voice_client.play(source, after=lambda e: self.check_queue(ctx))
-            logger.info(f"Reproduciendo: {title}")
+            ctx.voice_client.play(source, after=self._after_callback(ctx))
+            logger.info(f"Reproduciendo: {title}" + (" (pre-warm)" if warm else ""))
+            if play:
+                # Solo cuenta lo que de verdad suena (no pre-warms descartados)
+                self.core.audio_cache.record_play(*play)
+            # Duración desconocida (LIVE) -> no hay momento "antes del final"
+            if duration:
+                self._schedule_prewarm(ctx, max(0, duration - config.PREWARM_SECONDS))
+
+            requested_at = self.play_requested_at.pop(guild_id, None)
+            if requested_at:
+                logger.info(f"⏱️ Time-to-first-audio: {int((time.perf_counter() - requested_at) * 1000)}ms ({title})")
             
             # 5. Registrar Info
-            self.current_song_info[ctx.guild.id] = {
+            self.current_song_info[guild_id] = {
                 'start_time': time.time(),
                 'duration': duration,
                 'title': title,
@@ -249,66 +393,154 @@ class Music(commands.Cog):
                 if is_radio_prefetch:
                     log_user_id = self.bot.user.id
                 
-                database.log_song(ctx.guild.id, log_user_id, title)
+                database.log_song(guild_id, log_user_id, title)
             except Exception as e:
-                logger.error(f"Error logging song history in check_queue: {e}")
+                logger.error(f"Error logging song history in player: {e}")
 
             # 6. Actualizar UI (Async)
-            async def send_np():
-                view = MusicControlView(ctx, self)
-                m, s = divmod(int(duration), 60)
-                dur_str = f"[{m:02d}:{s:02d}]" if duration > 0 else "[LIVE]"
-                
-                embed = discord.Embed(title="▶️ Ahora Suena", description=f"**{title}**", color=discord.Color.green())
-                embed.add_field(name="⏱️ Duración", value=f"`{dur_str}`", inline=True)
-                
-                # Next Song Preview
-                next_str = self._get_next_song_peek(ctx.guild.id)
-                embed.add_field(name="⏭️ Siguiente", value=f"`{next_str}`", inline=True)
-
-                # Footer Info
-                radio_status = self.radio_active.get(ctx.guild.id)
-                if is_radio_prefetch:
-                     footer_text = "👤 DJ: Asuka AI 🤖"
-                     if radio_status and isinstance(radio_status, str) and radio_status.startswith("SPECIFIC:"):
-                         station = radio_status.split(":", 1)[1]
-                         embed.set_author(name=f"📻 Estación: {station}")
-                     else:
-                         embed.set_author(name="📻 Estación: Mix Automático")
-                else:
-                     footer_text = f"👤 Pedido por: {ctx.author.display_name}"
-                     embed.set_author(name="📀 Reproducción Manual")
-                
-                embed.set_footer(text=f"{footer_text} | Creado por Noel ❤️")
-                    
-                msg = await ctx.send(embed=embed, view=view)
-                self.now_playing_messages[ctx.guild.id] = msg
-
-            asyncio.run_coroutine_threadsafe(send_np(), self.bot.loop)
+            asyncio.create_task(self._send_np(ctx, title, duration, is_radio_prefetch))
             
             # 7. Prefetch Logic
-            if self.queues[ctx.guild.id]:
+            if self.queues[guild_id]:
                  # Manual Prefetch
-                 asyncio.run_coroutine_threadsafe(self._prefetch_manual_queue(ctx), self.bot.loop)
-            elif self.radio_active.get(ctx.guild.id, False):
-                 # Radio Prefetch
-                 if ctx.guild.id not in self.radio_processing:
-                     logger.info("📻 Prefetching next radio song...")
-                     self.radio_processing.add(ctx.guild.id)
-                     asyncio.run_coroutine_threadsafe(self._queue_radio_song(ctx), self.bot.loop)
+                 asyncio.create_task(self._prefetch_manual_queue(ctx))
+            # Radio Prefetch: mantener el buffer por encima del mínimo
+            self._refill_radio(ctx)
+            return
+
+        # Cola vacía (Idle)
+        if not self._trigger_radio(ctx):
+            logger.info("Cola terminada.")
+
+    # --- Pre-warm (transiciones sin hueco) ---
+    # Unos segundos antes de que acabe la canción se crea la fuente FFmpeg de la siguiente:
+    # el proceso arranca, hace el TLS y llena el pipe mientras aún suena la actual.
+
+    def _schedule_prewarm(self, ctx, delay):
+        guild_id = ctx.guild.id
+        task = self.prewarm_tasks.pop(guild_id, None)
+        if task:
+            task.cancel()
+        if config.PREWARM_SECONDS <= 0:
+            return
+        self.prewarm_tasks[guild_id] = asyncio.create_task(self._prewarm_next(ctx, delay))
 
+    async def _prewarm_next(self, ctx, delay):
+        await asyncio.sleep(delay)
+        guild_id = ctx.guild.id
+        queue = self.queues.get(guild_id)
+        if not queue:
+            return
+
+        queue_item = queue[0]
+        item, _ = self._unwrap_queue_item(queue_item)
+        if not isinstance(item, tuple) or item[0] in ["INTRO", "TEXT_INTRO"] or isinstance(item[0], discord.AudioSource):
+            return
+
+        result = await self._create_audio_source(ctx, item)
+        source, title, _, error, _ = result
+        if error or not source:
+            return
+
+        # La cola pudo cambiar mientras resolvíamos (skip, stop, !play con prioridad...)
+        if not self.queues.get(guild_id) or self.queues[guild_id][0] is not queue_item:
+            source.cleanup()
+            return
+
+        self._discard_warm_source(guild_id)
+        self.warm_sources[guild_id] = (queue_item, result)
+        logger.info(f"🔥 Pre-warm listo: {title}")
+
+    def _take_warm_source(self, guild_id, queue_item):
+        """Retorna el resultado pre-calentado si corresponde a este item (identidad); si no, lo limpia."""
+        warm = self.warm_sources.pop(guild_id, None)
+        if not warm:
+            return None
+        warm_item, result = warm
+        if warm_item is not queue_item:
+            result[0].cleanup()
+            return None
+
+        # El volumen pudo cambiar desde que se creó
+        if isinstance(result[0], discord.PCMVolumeTransformer):
+            result[0].volume = self.volumes.get(guild_id, config.DEFAULT_VOLUME)
+        return result
+
+    def _discard_warm_source(self, guild_id):
+        task = self.prewarm_tasks.pop(guild_id, None)
+        if task:
+            task.cancel()
+        warm = self.warm_sources.pop(guild_id, None)
+        if warm:
+            warm[1][0].cleanup()
+
+    def _radio_ready_count(self, guild_id):
+        """Canciones de radio ya preparadas en la cola (sin contar intros)."""
+        count = 0
+        for queue_item in self.queues.get(guild_id, []):
+            item, is_radio = self._unwrap_queue_item(queue_item)
+            if is_radio and isinstance(item, tuple) and item[0] not in ["INTRO", "TEXT_INTRO"]:
+                count += 1
+        return count
+
+    def _refill_radio(self, ctx):
+        """Pide otro lote si la cola es solo radio y quedan RADIO_LOW_WATER canciones listas o menos."""
+        guild_id = ctx.guild.id
+        queue = self.queues.get(guild_id, [])
+        # Mientras haya canciones del usuario, la radio espera
+        if any(not self._unwrap_queue_item(queue_item)[1] for queue_item in queue):
+            return False
+        if self._radio_ready_count(guild_id) > config.RADIO_LOW_WATER:
+            return False
+        return self._trigger_radio(ctx)
+
+    def _invalidate_radio(self, guild_id):
+        """La estación cambió (!dj / !stop): los lotes en vuelo se descartarán al llegar."""
+        self.radio_generation[guild_id] = self.radio_generation.get(guild_id, 0) + 1
+
+    def _trigger_radio(self, ctx):
+        """Si la radio está activa, genera la siguiente canción en background (avisa con RADIO_READY)."""
+        guild_id = ctx.guild.id
+        if not self.radio_active.get(guild_id, False):
+            return False
+        if guild_id not in self.radio_processing:
+            logger.info("📻 Prefetching next radio song...")
+            self.radio_processing.add(guild_id)
+            asyncio.create_task(self._queue_radio_song(ctx))
+        return True
+
+    async def _send_np(self, ctx, title, duration, is_radio_prefetch):
+        view = MusicControlView(ctx, self)
+        m, s = divmod(int(duration), 60)
+        dur_str = f"[{m:02d}:{s:02d}]" if duration > 0 else "[LIVE]"
+        
+        embed = discord.Embed(title="▶️ Ahora Suena", description=f"**{title}**", color=discord.Color.green())
+        embed.add_field(name="⏱️ Duración", value=f"`{dur_str}`", inline=True)
+        
+        # Next Song Preview
+        next_str = self._get_next_song_peek(ctx.guild.id)
+        embed.add_field(name="⏭️ Siguiente", value=f"`{next_str}`", inline=True)
+
+        # Footer Info
+        radio_status = self.radio_active.get(ctx.guild.id)
+        if is_radio_prefetch:
+             footer_text = "👤 DJ: Asuka AI 🤖"
+             if radio_status and isinstance(radio_status, str) and radio_status.startswith("SPECIFIC:"):
+                 station = radio_status.split(":", 1)[1]
+                 embed.set_author(name=f"📻 Estación: {station}")
+             else:
+                 embed.set_author(name="📻 Estación: Mix Automático")
         else:
-            # Cola vacía (Idle)
-            if self.radio_active.get(ctx.guild.id, False):
-                if ctx.guild.id not in self.radio_processing:
-                    logger.info("📻 Cola vacía. Triggering Radio...")
-                    self.radio_processing.add(ctx.guild.id)
-                    async def start_radio():
-                        await self._queue_radio_song(ctx)
-                        self.check_queue(ctx)
-                    asyncio.run_coroutine_threadsafe(start_radio(), self.bot.loop)
-            else:
-                logger.info("Cola terminada.")
+             footer_text = f"👤 Pedido por: {ctx.author.display_name}"
+             embed.set_author(name="📀 Reproducción Manual")
+        
+        embed.set_footer(text=f"{footer_text} | Creado por Noel ❤️")
+            
+        try:
+            msg = await ctx.send(embed=embed, view=view)
+            self.now_playing_messages[ctx.guild.id] = msg
+        except Exception as e:
+            logger.error(f"Error sending NP embed: {e}")
 
 
     @commands.command()
@@ -320,6 +552,7 @@ class Music(commands.Cog):
         if ctx.voice_client is None:
             await channel.connect()
 
+        requested_at = time.perf_counter()
         msg = await ctx.send(f"🔍 **Buscando:** `{query}`...")
 
         # --- Prioridad de Usuario: Limpiar Radio Prefetch ---
@@ -332,17 +565,33 @@ class Music(commands.Cog):
             if len(clean_q) < len(original_q):
                 self.queues[ctx.guild.id] = clean_q
                 logger.info(f"Purged radio prefetch for user priority in {ctx.guild.id}")
+                self._discard_warm_source(ctx.guild.id)
                 # Opcional: Avisar al usuario
                 # await ctx.send("🧹 **Interrumpiendo a la radio para poner tu canción...**")
 
+        # --- SPOTIFY: encolar página a página y arrancar con la primera ---
+        if 'open.spotify.com' in query and self.core.sp:
+            return await self._play_spotify(ctx, query, msg, requested_at)
+
         # --- BUSQUEDA CON MUSIC CORE ---
         await msg.edit(content=f"🔍 **Buscando en todas las plataformas:** `{query}`...")
         
         try:
-             results = await self.core.search(query)
+             results = None
+             if not query.startswith("http"):
+                  # Texto simple: una sola extracción completa (metadata + stream) en vez de
+                  # búsqueda flat + resolución. El stream queda en cache para _create_audio_source.
+                  results = await self._resolve_text_query(query)
+             if not results:
+                  results = await self.core.search(query)
         except Exception as e:
              return await msg.edit(content="❌ Error buscando la canción.")
 
+        # Resolución especulativa: un único video (ej: link directo) -> resolver el stream ya,
+        # mientras se encola / termina la canción actual.
+        if results and len(results) == 1 and results[0]['type'] == 'video' and results[0].get('url'):
+             asyncio.create_task(self.core.get_stream_url(results[0]['url']))
+
         if not results:
              return await msg.edit(content="❌ No encontré resultados.")
 
@@ -391,9 +640,12 @@ class Music(commands.Cog):
                  embed.set_footer(text="Creado por Noel ❤️")
                  await ctx.send(embed=embed)
                  await self._update_np_embed(ctx)
+             # Resolver por adelantado lo que acaba de entrar en la cola
+             asyncio.create_task(self._prefetch_manual_queue(ctx))
         else:
-             # Start (DEADLOCK FIX: Run in Executor because check_queue blocks on lazy resolution)
-             await self.bot.loop.run_in_executor(None, self.check_queue, ctx)
+             # Start
+             self.play_requested_at[ctx.guild.id] = requested_at
+             self._notify(ctx, EVENT_ENQUEUE)
 
         # Log History (First song only for brevity)
         try:
@@ -401,10 +653,87 @@ class Music(commands.Cog):
         except Exception as e:
             logger.error(f"Error guardando historial musical: {e}")
 
+    async def _play_spotify(self, ctx, query, msg, requested_at):
+        """
+        Encola un link de Spotify (track/playlist/álbum/artista) página a página.
+        La reproducción arranca con la primera página mientras el resto sigue cargando.
+        """
+        guild_id = ctx.guild.id
+        added_count = 0
+        first_title = None
+        started = False
+
+        try:
+            async for page in self.core.iter_spotify_tracks(query):
+                if guild_id not in self.queues: self.queues[guild_id] = []
+                for res in page:
+                    self.queues[guild_id].append(("PENDING_SEARCH", res['title']))
+                    added_count += 1
+                    if not first_title: first_title = res['title']
+
+                if added_count and not started:
+                    started = True
+                    was_playing = ctx.voice_client.is_playing()
+                    if not was_playing:
+                        # El player resuelve la 1ª canción en su task mientras seguimos paginando
+                        self.play_requested_at[guild_id] = requested_at
+                        self._notify(ctx, EVENT_ENQUEUE)
+                    else:
+                        asyncio.create_task(self._prefetch_manual_queue(ctx))
+
+                if added_count > 1:
+                    await msg.edit(content=f"🎶 **Añadiendo desde Spotify...** ({added_count} canciones)")
+        except Exception as e:
+            logger.error(f"Spotify ingest error: {e}")
+            if added_count == 0:
+                return await msg.edit(content="❌ Error leyendo el link de Spotify.")
+
+        if added_count == 0:
+            return await msg.edit(content="❌ No encontré canciones en ese link.")
+
+        # --- Feedback ---
+        if added_count > 1:
+            await msg.edit(content=f"🎶 **Añadidas {added_count} canciones** a la cola.")
+        else:
+            await msg.delete()
+            if was_playing:
+                embed = discord.Embed(title="🎵 Añadida a la cola", description=f"**{first_title}**", color=discord.Color.blue())
+                embed.set_footer(text="Creado por Noel ❤️")
+                await ctx.send(embed=embed)
+        await self._update_np_embed(ctx)
+
+        # Log History (First song only for brevity)
+        try:
+            database.log_song(guild_id, ctx.author.id, first_title)
+        except Exception as e:
+            logger.error(f"Error guardando historial musical: {e}")
+
+    async def _resolve_text_query(self, query):
+        """
+        Resuelve una búsqueda de texto con una sola extracción completa.
+        Retorna una lista con un resultado en formato MusicCore.search, o [] si falla.
+        El item de cola guarda la URL del video (no la del stream): al reproducir,
+        get_stream_url la encuentra en stream_cache por video id.
+        """
+        data = await self.core.get_stream_url(query)
+        if not data or not data.get('webpage_url'):
+            return []
+        return [{
+            'type': 'video',
+            'id': data.get('id'),
+            'title': data.get('title') or query,
+            'url': data['webpage_url'],
+            'webpage_url': data['webpage_url'],
+            'duration': data.get('duration') or 0,
+            'source': 'youtube',
+            'thumbnail': data.get('thumbnail')
+        }]
+
     @commands.command()
     async def skip(self, ctx):
         if ctx.voice_client and ctx.voice_client.is_playing():
-            ctx.voice_client.stop()
+            ctx.voice_client.stop() # El callback `after` avisa TRACK_FINISHED
+            self._notify(ctx, EVENT_SKIP)
             await ctx.send("⏭️ **Saltando canción...**")
 
     @commands.command()
@@ -449,12 +778,15 @@ class Music(commands.Cog):
             
         if 0 <= vol <= 100:
             new_vol = vol / 100
-            if ctx.voice_client and ctx.voice_client.source:
-                ctx.voice_client.source.volume = new_vol
-            
             self.volumes[ctx.guild.id] = new_vol # Guardar persistencia
-            
-            await ctx.send(f"🔊 **Volumen:** {vol}%")
+
+            source = ctx.voice_client.source
+            if isinstance(source, discord.PCMVolumeTransformer):
+                source.volume = new_vol
+                await ctx.send(f"🔊 **Volumen:** {vol}%")
+            else:
+                # Opus passthrough: el volumen va como filtro de ffmpeg en la siguiente fuente
+                await ctx.send(f"🔊 **Volumen:** {vol}% (se aplica desde la siguiente canción)")
         else:
             await ctx.send("❌ Elige un número entre 0 y 100.")
 
@@ -506,6 +838,7 @@ class Music(commands.Cog):
             # Limpiar cola
             if ctx.guild.id in self.queues:
                 self.queues[ctx.guild.id] = []
+            self._discard_warm_source(ctx.guild.id)
             
             # Limpiar info actual
             if ctx.guild.id in self.current_song_info:
@@ -518,6 +851,7 @@ class Music(commands.Cog):
             # Desactivar radio si estaba activa
             if ctx.guild.id in self.radio_active and self.radio_active[ctx.guild.id]:
                 self.radio_active[ctx.guild.id] = None
+                self._invalidate_radio(ctx.guild.id)
                 await ctx.send("🛑 **Música detenida y Radio APAGADA.**")
             else:
                 await ctx.send("🛑 **Música detenida y cola limpiada.**")
@@ -539,6 +873,7 @@ class Music(commands.Cog):
         if query:
             # Modo específico (siempre activa o cambia)
             self.radio_active[guild_id] = f"SPECIFIC:{query}"
+            self._invalidate_radio(guild_id)
             self.radio_session_start.add(guild_id) # Marcar inicio de sesión
 
             # --- BUG FIX: Limpiar canciones de radio anterior ---
@@ -549,16 +884,19 @@ class Music(commands.Cog):
                 if len(clean_q) < len(original_q):
                     self.queues[guild_id] = clean_q
                     logger.info(f"Purged old radio songs for new station request: {query}")
+                    self._discard_warm_source(guild_id)
             
             await ctx.send(f"🎧 **DJ Asuka: {query}** 🎚️\n*Solo pondré canciones de: {query}.*")
             should_start = True
         elif current_mode:
             # Si estaba encendida -> Apagar
             self.radio_active[guild_id] = None
+            self._invalidate_radio(guild_id)
             await ctx.send("🔇 **DJ Asuka: APAGADA** 💤")
         else:
             # Encender automático
             self.radio_active[guild_id] = "AUTO"
+            self._invalidate_radio(guild_id)
             self.radio_session_start.add(guild_id) # Marcar inicio de sesión
 
             # --- BUG FIX: Limpiar canciones de radio anterior ---
@@ -569,6 +907,7 @@ class Music(commands.Cog):
                 if len(clean_q) < len(original_q):
                     self.queues[guild_id] = clean_q
                     logger.info("Purged old radio songs for AUTO mode.")
+                    self._discard_warm_source(guild_id)
 
             await ctx.send("🎧 **DJ Asuka: AUTOMÁTICA** 🎚️\n*Pondré música basada en tu historial reciente.*")
             should_start = True
@@ -591,18 +930,21 @@ class Music(commands.Cog):
                             
                             if path:
                                 source = discord.FFmpegPCMAudio(path)
-                                # Play Greeting -> Luego check_queue
-                                ctx.voice_client.play(source, after=lambda e: self.check_queue(ctx))
+                                # Play Greeting -> Al terminar, el player sigue con la cola
+                                self._get_player(ctx)
+                                ctx.voice_client.play(source, after=self._after_callback(ctx))
                                 if text: await ctx.send(f"🗣️ **Asuka:** {text}")
                         except Exception as e:
                             logger.error(f"Error greeting in radio: {e}")
                 else:
                     await ctx.send(f"⚠️ Modo DJ activo, pero no estás en un canal de voz.")
 
-            # 2. Trigger Prefetch (Always call check_queue to ensure loop starts/prefetches)
-            # If playing greeting -> triggers prefetch background
-            # If idle (no greeting generated) -> triggers play immediately
-            self.check_queue(ctx)
+            # 2. Trigger Prefetch
+            # If playing greeting -> la radio se genera en background mientras habla
+            # If idle (no greeting generated) -> el player arranca en cuanto haya canción (RADIO_READY)
+            if not self.queues.get(guild_id):
+                self._trigger_radio(ctx)
+            self._notify(ctx, EVENT_ENQUEUE)
 
     @commands.group(invoke_without_command=True)
     async def playlist(self, ctx):
@@ -707,7 +1049,7 @@ class Music(commands.Cog):
             
             # Start if idle
             if not ctx.voice_client.is_playing():
-                self.check_queue(ctx)
+                self._notify(ctx, EVENT_ENQUEUE)
             else:
                 # Trigger prefetch manually if playing
                 await self._prefetch_manual_queue(ctx)
@@ -847,91 +1189,131 @@ class Music(commands.Cog):
             logger.error(f"Error updating NP embed: {e}")
 
     async def _prefetch_manual_queue(self, ctx):
-        """Intenta resolver la siguiente canción de la cola manual (Spotify/Youtube Prio) en background."""
+        """
+        Pipeline de prefetch: resuelve en background los próximos N items de la cola (de cualquier tipo).
+        - PENDING_SEARCH -> se reemplaza por (None, title, watch_url, duration) si sigue en la cola.
+        - URLs de YouTube -> se calienta el stream_cache (y se re-resuelve si la URL expiró).
+        Una sola ejecución por guild; si la cola cambia mientras corre, se repite al terminar.
+        """
         guild_id = ctx.guild.id
         if guild_id not in self.queues or not self.queues[guild_id]:
             return
-            
-        # Capturamos el objetivo por referencia (identidad)
-        target_item = self.queues[guild_id][0]
-        
-        # Solo nos interesa resolver búsquedas pendientes
-        # Si ya es un source (tuple len 2 or 3 with AudioSource) o URL (tuple len 3/4 with None),
-        # podriamos querer "refrescar" la URL si es vieja, pero por ahora solo PENDING_SEARCH es el blocker principal.
-        
-        is_pending = False
-        query = ""
-        
-        if isinstance(target_item, tuple) and len(target_item) >= 2:
-             if target_item[0] == "PENDING_SEARCH":
-                 is_pending = True
-                 query = target_item[1]
-        
-        if not is_pending:
+
+        if guild_id in self.prefetch_running:
+            self.prefetch_dirty.add(guild_id)
             return
 
-        logger.info(f"⏭️ Prefetching Manual Item: {query}")
-        
+        self.prefetch_running.add(guild_id)
         try:
-            # Utilizar Core para obtener URL
+            while True:
+                self.prefetch_dirty.discard(guild_id)
+                targets = self._prefetch_targets(guild_id)
+                if not targets:
+                    break
+
+                slots = asyncio.Semaphore(config.PREFETCH_CONCURRENCY)
+                async def run(target):
+                    async with slots:
+                        return await self._prefetch_item(guild_id, target)
+
+                changed = await asyncio.gather(*(run(t) for t in targets))
+                if any(changed):
+                    # Trigger visual update
+                    await self._update_np_embed(ctx)
+
+                if guild_id not in self.prefetch_dirty:
+                    break
+        finally:
+            self.prefetch_running.discard(guild_id)
+
+    def _prefetch_targets(self, guild_id):
+        """Los próximos PREFETCH_DEPTH items resolubles de la cola (sin contar intros)."""
+        targets = []
+        for target_item in list(self.queues.get(guild_id, [])):
+            item, _ = self._unwrap_queue_item(target_item)
+            if not isinstance(item, tuple) or len(item) < 2:
+                continue
+            if item[0] == "PENDING_SEARCH" or (item[0] is None and len(item) > 2 and self._is_youtube_url(item[2])):
+                targets.append(target_item)
+            elif item[0] in ["INTRO", "TEXT_INTRO"]:
+                continue
+            if len(targets) >= config.PREFETCH_DEPTH:
+                break
+        return targets
+
+    async def _prefetch_item(self, guild_id, target_item):
+        """Resuelve un item. Retorna True si se reemplazó en la cola."""
+        item, is_radio = self._unwrap_queue_item(target_item)
+        query = item[1] if item[0] == "PENDING_SEARCH" else item[2]
+
+        try:
+            # Utilizar Core para obtener URL (queda en stream_cache para _create_audio_source)
             data = await self.core.get_stream_url(query)
             
             if not data:
                 # Si falló, intentar fallback o loguear
-                logger.error(f"Manual prefetch failed for {query}")
-                return
-            
-            # Construir item resuelto (Formato 5: None, title, url, duration)
-            resolved_item = (None, data['title'], data['url'], data.get('duration', 0))
+                logger.error(f"Prefetch failed for {query}")
+                return False
+
+            if item[0] != "PENDING_SEARCH":
+                return False
+
+            # Construir item resuelto (None, title, watch_url, duration). Guardamos la URL del video
+            # y no la del stream: si expira antes de sonar, get_stream_url la vuelve a resolver.
+            resolved_item = (None, data['title'], data.get('webpage_url') or data['url'], data.get('duration') or 0) + tuple(item[2:])
+            if is_radio:
+                resolved_item = ("RADIO_CANDIDATE", resolved_item)
             
             # --- CRITICAL: Identity Check ---
-            # Verificamos si el item en la posición 0 SIGUE SIENDO el que intentamos resolver.
-            # Si el usuario hizo !skip, el item 0 habrá cambiado y no debemos tocarlo.
-            if guild_id in self.queues and self.queues[guild_id]:
-                if self.queues[guild_id][0] is target_item:
-                    self.queues[guild_id][0] = resolved_item
-                    logger.info(f"✅ Manual Prefetch Success: {data['title']}")
-                    # Trigger visual update
-                    await self._update_np_embed(ctx)
-                else:
-                    logger.info("⚠️ Manual Prefetch Discarded: Queue changed (Race Condition handled).")
+            # Buscamos el item por identidad (su posición pudo cambiar).
+            # Si el usuario hizo !skip / !stop, ya no estará y no debemos tocar nada.
+            queue = self.queues.get(guild_id, [])
+            for i, current in enumerate(queue):
+                if current is target_item:
+                    queue[i] = resolved_item
+                    logger.info(f"✅ Prefetch Success: {data['title']}")
+                    return True
+
+            logger.info("⚠️ Prefetch Discarded: Queue changed (Race Condition handled).")
+            return False
                     
         except Exception as e:
-            logger.error(f"Error manual prefetch {query}: {e}")
+            logger.error(f"Error prefetch {query}: {e}")
+            return False
+
+    def _is_youtube_url(self, url):
+        return bool(url) and ("youtube.com/watch" in url or "youtu.be/" in url)
 
     async def _queue_radio_song(self, ctx):
-        """Genera contenido de radio y lo AÑADE A LA COLA (Prefetch)."""
+        """
+        Rellena el buffer de la radio: pide a Gemini las canciones que faltan hasta RADIO_BUFFER_SIZE
+        en una sola llamada y las AÑADE A LA COLA como RADIO_CANDIDATE (Prefetch).
+        Si la estación cambia mientras tanto (!dj, !stop), el lote se descarta.
+        """
+        guild_id = ctx.guild.id
+        station = (self.radio_active.get(guild_id), self.radio_generation.get(guild_id, 0))
+        stale = False
         try:
-            # Imports locales para evitar ciclos
-            import google.generativeai as genai
-            import edge_tts
-            import json
-            import re
-            
             # --- Generación de Contenido ---
             # Recuperar historial
             recent_songs = database.get_recent_songs(ctx.guild.id, limit=20)
             
-            immediate_context = ""
-            older_context = ""
+            immediate_context = []
+            older_context = []
             
             if recent_songs:
-                # Deduplicar preservando orden
+                # Deduplicar preservando orden (las filas son (rowid, title))
                 unique_recent = []
                 vis = set()
-                for s in recent_songs:
-                    if s not in vis:
-                        unique_recent.append(s)
-                        vis.add(s)
+                for _, title in recent_songs:
+                    if title not in vis:
+                        unique_recent.append(title)
+                        vis.add(title)
                 
-                # Split: Top 5 (Recent) vs Rest (Older)
-                immediate_list = unique_recent[:5]
-                older_list = unique_recent[5:15] # Take next 10
-                
-                immediate_context = ". ".join(immediate_list)
-                older_context = ". ".join(older_list)
+                # Split: Top 5 (Recent) vs Rest (Older) - MusicCore espera listas de títulos
+                immediate_context = unique_recent[:5]
+                older_context = unique_recent[5:15] # Take next 10
 
-            # Verificar modo
             # Verificar modo
             radio_mode = self.radio_active.get(ctx.guild.id, "AUTO")
             
@@ -945,43 +1327,53 @@ class Music(commands.Cog):
                 self.radio_session_start.remove(ctx.guild.id)
                 is_start = True
 
-            # --- Generar Contenido con MusicCore ---
-            radio_data = await self.core.generate_radio_content(immediate_context, older_context, is_start, mood=mood_arg)
+            # --- Cuántas faltan para llenar el buffer ---
+            count = max(1, config.RADIO_BUFFER_SIZE - self._radio_ready_count(guild_id))
+
+            # --- Generar Contenido con MusicCore (un lote, una llamada a Gemini) ---
+            batch = await self.core.generate_radio_batch(immediate_context, older_context, count, is_start, mood=mood_arg)
+
+            if station != (self.radio_active.get(guild_id), self.radio_generation.get(guild_id, 0)):
+                # La estación cambió mientras Gemini pensaba: este lote ya no pinta nada
+                stale = True
+                logger.info(f"📻 Radio batch discarded (station changed) in {guild_id}")
+                return
             
             # --- Preparar Items para la Cola ---
-            queue_items = []
-            current_announcer_mode = self.announcer_mode.get(ctx.guild.id, config.ANNOUNCER_MODE)
-            
-            song_name = radio_data.get('song_query', 'Unknown')
-            intro_text = radio_data.get('intro_text', '')
-            intro_audio = radio_data.get('intro_audio')
-            song_data = radio_data.get('song_data')
-            
-            logger.info(f"📻 Radio Prepared: {song_name}")
+            current_announcer_mode = self.announcer_mode.get(guild_id, config.ANNOUNCER_MODE)
+            if guild_id not in self.queues:
+                self.queues[guild_id] = []
+
+            for radio_data in batch:
+                queue_items = []
+                song_name = radio_data.get('song_query', 'Unknown')
+                intro_text = radio_data.get('intro_text', '')
+                intro_audio = radio_data.get('intro_audio')
+                song_data = radio_data.get('song_data')
+
+                if not song_data:
+                    logger.error(f"Failed to find stream for radio: {song_name}")
+                    continue
+                
+                logger.info(f"📻 Radio Prepared: {song_name}")
 
-            # 1. Intro Item
-            if current_announcer_mode == "FULL" and intro_audio:
-                queue_items.append(("INTRO", intro_audio, intro_text))
-            elif current_announcer_mode == "TEXT" and intro_text:
-                queue_items.append(("TEXT_INTRO", intro_text))
-            
-            # 2. Song Item
-            if song_data:
-                url = song_data['url']
+                # 1. Intro Item
+                if current_announcer_mode == "FULL" and intro_audio:
+                    queue_items.append(("INTRO", intro_audio, intro_text))
+                elif current_announcer_mode == "TEXT" and intro_text:
+                    queue_items.append(("TEXT_INTRO", intro_text))
+                
+                # 2. Song Item
+                # URL del video (no del stream): el prefetch / _create_audio_source la re-resuelven si expira
+                url = song_data.get('webpage_url') or song_data['url']
                 title = song_data['title']
                 duration = song_data.get('duration', 0)
-                # Append formatted song item
                 queue_items.append((None, title, url, duration))
-            else:
-                logger.error(f"Failed to find stream for radio: {song_name}")
-            
-            # --- Añadir a la Cola ---
-            if ctx.guild.id not in self.queues:
-                self.queues[ctx.guild.id] = []
             
-            for item in queue_items:
-                # Envolvemos en RADIO_CANDIDATE para identificarlo y borrarlo si el usuario usa !play
-                self.queues[ctx.guild.id].append(("RADIO_CANDIDATE", item))
+                # --- Añadir a la Cola ---
+                for item in queue_items:
+                    # Envolvemos en RADIO_CANDIDATE para identificarlo y borrarlo si el usuario usa !play
+                    self.queues[guild_id].append(("RADIO_CANDIDATE", item))
             
             # Trigger Visual Update
             await self._update_np_embed(ctx)
@@ -991,8 +1383,14 @@ class Music(commands.Cog):
                 
         finally:
             # Limpiar flag
-            if ctx.guild.id in self.radio_processing:
-                self.radio_processing.remove(ctx.guild.id)
+            if guild_id in self.radio_processing:
+                self.radio_processing.remove(guild_id)
+            if stale:
+                # Empezar el buffer de la estación nueva (su trigger se ignoró mientras estábamos ocupados)
+                self._refill_radio(ctx)
+            # Avisar al player (si está callado, arranca con lo nuevo)
+            elif self.radio_active.get(guild_id) and self.queues.get(guild_id):
+                self._notify(ctx, EVENT_RADIO_READY)
 
     @commands.command(aliases=['salir', 'disconnect', 'bye'])
     async def leave(self, ctx):
@@ -1001,6 +1399,7 @@ class Music(commands.Cog):
             self.queues[ctx.guild.id] = []
             if ctx.guild.id in self.current_song_info:
                 del self.current_song_info[ctx.guild.id]
+            self._stop_player(ctx.guild.id)
             await ctx.voice_client.disconnect()
             await ctx.send("👋 **Me voy!**")
         else:
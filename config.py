@@ -34,15 +34,66 @@ except json.JSONDecodeError:
 AI_MODEL = SETTINGS['ai'].get('model', 'gemini-1.5-flash')
 AI_TEMPERATURE = SETTINGS['ai'].get('temperature', 0.9)
 AI_SYSTEM_PROMPT = SETTINGS['ai'].get('system_prompt', "Eres Asuka, un bot de música útil y sarcástico.")
+AI_TIMEOUT = SETTINGS['ai'].get('timeout', 30) # Segundos por llamada a Gemini
+AI_RETRIES = SETTINGS['ai'].get('retries', 1) # Reintentos en llamadas sin estado (no chats)
+AI_RATE_PER_MINUTE = SETTINGS['ai'].get('rate_per_minute', 15) # Token bucket compartido por todas las llamadas
+AI_BURST = SETTINGS['ai'].get('burst', 5)
+AI_MAX_QUEUE = SETTINGS['ai'].get('max_queue', 20) # Peticiones en espera por prioridad
+AI_DEADLINE_INTERACTIVE = SETTINGS['ai'].get('deadline_interactive', 20) # Segundos máximos esperando turno
+AI_DEADLINE_GREETING = SETTINGS['ai'].get('deadline_greeting', 8) # Un saludo tardío ya no tiene sentido
+AI_DEADLINE_BACKGROUND = SETTINGS['ai'].get('deadline_background', 60)
+AI_QUOTA_BACKOFF = SETTINGS['ai'].get('quota_backoff', 20) # Pausa global tras un 429
+CHAT_CONTEXT_TOKENS = SETTINGS['ai'].get('chat_context_tokens', 2000) # Presupuesto de historial por mensaje (resumen + ventana)
+CHAT_WINDOW_MAX_MESSAGES = SETTINGS['ai'].get('chat_window_max_messages', 60) # Tope de turnos recientes a considerar
+CHAT_SUMMARY_BATCH = SETTINGS['ai'].get('chat_summary_batch', 20) # Mensajes fuera de la ventana antes de resumir
+CHAT_SUMMARY_MAX_WORDS = SETTINGS['ai'].get('chat_summary_max_words', 200)
+CHAT_SESSION_MAX = SETTINGS['ai'].get('session_max', 200) # Sesiones de Discord (servidor/DM) en memoria
+CHAT_SESSION_IDLE_TTL = SETTINGS['ai'].get('session_idle_minutes', 30) * 60 # Inactividad antes de expulsarla
+CHAT_SESSION_CONTEXT_TOKENS = SETTINGS['ai'].get('session_context_tokens', 1500) # Historial enviado por turno
+CHAT_SESSION_TRANSCRIPT_MAX = SETTINGS['ai'].get('session_transcript_max', 40) # Turnos guardados para rehidratar
+MEMORY_TOP_K = SETTINGS['ai'].get('memory_top_k', 5) # Datos de !recuerda que van en cada prompt (los más relevantes)
+MEMORY_DEDUP_THRESHOLD = SETTINGS['ai'].get('memory_dedup_threshold', 0.9) # Similitud (coseno) para considerar un dato repetido
 
 # TTS Settings
 TTS_VOICE = SETTINGS['tts'].get('voice', 'es-MX-DaliaNeural')
 TTS_RATE = SETTINGS['tts'].get('rate', '+0%')
 TTS_PITCH = SETTINGS['tts'].get('pitch', '+0Hz')
+TTS_CACHE_DIR = SETTINGS['tts'].get('cache_dir', 'temp/tts_cache') # MP3s por contenido (texto+voz+rate+pitch)
+TTS_CACHE_MAX_BYTES = SETTINGS['tts'].get('cache_max_mb', 200) * 1024 * 1024
 
 # Music Settings
 DEFAULT_VOLUME = SETTINGS.get('music', {}).get('default_volume', 50) / 100
 ANNOUNCER_MODE = SETTINGS.get('music', {}).get('announcer_mode', "FULL") # FULL, TEXT, MUTE
+PREFETCH_DEPTH = SETTINGS.get('music', {}).get('prefetch_depth', 3) # Items de la cola a resolver por adelantado
+PREFETCH_CONCURRENCY = SETTINGS.get('music', {}).get('prefetch_concurrency', 2) # Resoluciones simultáneas por guild
+PREWARM_SECONDS = SETTINGS.get('music', {}).get('prewarm_seconds', 5) # Segundos antes del final para arrancar el FFmpeg siguiente (0 = desactivado)
+RADIO_BUFFER_SIZE = SETTINGS.get('music', {}).get('radio_buffer_size', 4) # Canciones de radio listas en cola (un lote de Gemini)
+RADIO_LOW_WATER = SETTINGS.get('music', {}).get('radio_low_water', 1) # Pedir otro lote al quedar estas o menos
+
+# Cache Settings
+CACHE_PERSIST = SETTINGS.get('cache', {}).get('persist', True) # Guardar caches en data/memory.db
+SEARCH_CACHE_SIZE = SETTINGS.get('cache', {}).get('search_max_entries', 1000)
+SEARCH_CACHE_TTL = SETTINGS.get('cache', {}).get('search_ttl', 21600) # Segundos (6h)
+STREAM_CACHE_SIZE = SETTINGS.get('cache', {}).get('stream_max_entries', 500)
+STREAM_CACHE_DEFAULT_TTL = SETTINGS.get('cache', {}).get('stream_default_ttl', 1800) # Si la URL no trae 'expire'
+STREAM_CACHE_REFRESH_MARGIN = SETTINGS.get('cache', {}).get('stream_refresh_margin', 1200) # Refrescar 20 min antes de expirar
+
+# Extraction Settings (yt-dlp)
+EXTRACT_BACKEND = SETTINGS.get('extraction', {}).get('backend', 'thread') # thread | process
+EXTRACT_WORKERS = SETTINGS.get('extraction', {}).get('workers', 4) # Hilos (o procesos) dedicados a yt-dlp
+EXTRACT_INSTANCES = SETTINGS.get('extraction', {}).get('instances_per_pool', 4) # YoutubeDL por set de opciones (solo backend thread)
+EXTRACT_MAX_PENDING = SETTINGS.get('extraction', {}).get('max_pending', 32) # En cola + en curso
+EXTRACT_QUEUE_TIMEOUT = SETTINGS.get('extraction', {}).get('queue_timeout', 15) # Segundos esperando hueco
+
+# Audio Cache (archivos Opus locales de las canciones más repetidas)
+AUDIO_CACHE_ENABLED = SETTINGS.get('audio_cache', {}).get('enabled', False) # Opt-in: descarga a disco
+AUDIO_CACHE_DIR = SETTINGS.get('audio_cache', {}).get('directory', 'data/audio_cache')
+AUDIO_CACHE_MAX_BYTES = SETTINGS.get('audio_cache', {}).get('max_mb', 2048) * 1024 * 1024 # Cuota total en disco
+AUDIO_CACHE_MIN_PLAYS = SETTINGS.get('audio_cache', {}).get('min_plays', 3) # Reproducciones antes de descargar
+AUDIO_CACHE_MAX_DURATION = SETTINGS.get('audio_cache', {}).get('max_track_seconds', 900) # No guardar mixes de horas
+
+# Playback: "pcm" (PCMVolumeTransformer) u "opus" (FFmpegOpusAudio, codec copy con volumen por defecto)
+PLAYBACK_MODE = SETTINGS.get('music', {}).get('playback_mode', "pcm")
 
 # FFMPEG & YTDL Options
 FFMPEG_OPTIONS = {
@@ -57,3 +108,7 @@ YTDL_FORMAT_OPTIONS = {
     'default_search': 'auto',
     'nocheckcertificate': True,
 }
+
+if PLAYBACK_MODE == "opus":
+    # Preferir los formatos Opus nativos de YouTube (webm, itag 251/250/249)
+    YTDL_FORMAT_OPTIONS['format'] = 'bestaudio[acodec=opus]/bestaudio/best'
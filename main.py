@@ -42,3 +42,5 @@ if __name__ == '__main__':
         logger.info("🛑 Bot detenido manualmente.")
     except Exception as e:
         logger.critical(f"🔥 Error crítico: {e}")
+    finally:
+        database.close_pool()
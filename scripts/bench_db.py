@@ -0,0 +1,107 @@
+"""
+Microbenchmark de utils/database.py: pool WAL (actual) vs. conexión nueva + lock global por llamada (anterior).
+
+Uso (desde la raíz del proyecto):
+    python scripts/bench_db.py [--ops 2000] [--threads 1 4 8] [--write-ratio 0.1]
+
+Trabaja sobre una base temporal; no toca data/memory.db.
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import database
+
+PooledConnection = database.DBConnection
+_legacy_lock = threading.Lock()
+
+
+class LegacyConnection:
+    """El DBConnection anterior: connect() + lock global en cada llamada, journal por defecto."""
+    def __init__(self, readonly=False):
+        pass
+
+    def __enter__(self):
+        _legacy_lock.acquire()
+        self.conn = sqlite3.connect(database.DB_NAME, check_same_thread=False)
+        return self.conn.cursor()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if exc_type:
+                self.conn.rollback()
+            else:
+                self.conn.commit()
+        finally:
+            self.conn.close()
+            _legacy_lock.release()
+
+
+def seed(users=50, facts=20, messages=200):
+    database.ensure_db()
+    with database.DBConnection() as c:
+        c.executemany("INSERT INTO memory VALUES (?, ?)",
+                      [(u, f"dato {i} del usuario {u}") for u in range(users) for i in range(facts)])
+        c.executemany("INSERT INTO chat_history (user_id, role, content) VALUES (?, ?, ?)",
+                      [(u, "user" if i % 2 == 0 else "model", f"mensaje {i}") for u in range(users) for i in range(messages)])
+        c.executemany("INSERT INTO audio_cache (video_id, plays, last_played) VALUES (?, 1, ?)",
+                      [(f"vid{i}", time.time()) for i in range(500)])
+
+
+def worker(ops, write_ratio, users, rnd):
+    for _ in range(ops):
+        user = rnd.randrange(users)
+        if rnd.random() < write_ratio:
+            database.add_chat_message(user, "user", "hola")
+        else:
+            op = rnd.randrange(3)
+            if op == 0:
+                database.get_memory(user)
+            elif op == 1:
+                database.get_chat_rows(user, limit=40)
+            else:
+                database.get_cached_audio(f"vid{rnd.randrange(500)}")
+
+
+def run(mode, threads, ops, write_ratio, users=50):
+    database.DBConnection = LegacyConnection if mode == "legacy" else PooledConnection
+    rnd_seeds = [random.Random(i) for i in range(threads)]
+    pool = [threading.Thread(target=worker, args=(ops, write_ratio, users, rnd_seeds[i])) for i in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return threads * ops / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=2000, help="Operaciones por hilo")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'modo':<8} {'hilos':>5} {'ops/s':>10}")
+        for mode in ("legacy", "pool"):
+            # Base nueva por modo: el modo legacy no debe heredar el WAL del pool
+            database.close_pool()
+            database.DB_NAME = os.path.join(tmp, f"{mode}.db")
+            database.DBConnection = PooledConnection if mode == "pool" else LegacyConnection
+            seed()
+            for threads in args.threads:
+                ops_s = run(mode, threads, args.ops, args.write_ratio)
+                print(f"{mode:<8} {threads:>5} {ops_s:>10.0f}")
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
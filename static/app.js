@@ -214,6 +214,14 @@ async function playTrack(track) {
     }
 }
 
+// Build /resolve URL: tracks from /search carry the video id, so the server
+// can go straight to that video instead of re-searching by title.
+function resolveUrlFor(track) {
+    let url = `${API_URL}/resolve?q=${encodeURIComponent(track.title)}`;
+    if (track.id) url += `&id=${encodeURIComponent(track.id)}`;
+    return url;
+}
+
 async function loadAndPlay(track) {
     if (!track) return;
 
@@ -241,7 +249,7 @@ async function loadAndPlay(track) {
         // Let's rely on a flag or specific check.
 
         if (!track.is_intro && !track.resolved && (!streamUrl || !streamUrl.startsWith("/temp"))) {
-            const res = await authenticatedFetch(`${API_URL}/resolve?q=${encodeURIComponent(track.title)}`);
+            const res = await authenticatedFetch(resolveUrlFor(track));
             if (!res.ok) throw new Error("Resolve failed");
             const data = await res.json();
             if (data.status === "error") throw new Error(data.message);
@@ -252,6 +260,8 @@ async function loadAndPlay(track) {
             // Update Track Info
             track.url = resolvedStreamUrl;
             track.thumbnail = data.thumbnail;
+            track.video_id = data.id;
+            track.duration = data.duration;
             track.resolved = true;
             streamUrl = resolvedStreamUrl; // Update local var
         }
@@ -269,7 +279,7 @@ async function loadAndPlay(track) {
         updateNowPlaying(track.title, artistName, track.thumbnail); // Use track.thumbnail as it might have been updated
 
         audioPlayer.src = streamUrl;
-        audioPlayer.play();
+        audioPlayer.play().then(() => reportPlayed(track)).catch(e => console.error("Play failed:", e));
         playBtn.innerHTML = '<i class="fa-solid fa-pause"></i>';
 
     } catch (e) {
@@ -287,6 +297,17 @@ async function loadAndPlay(track) {
     }
 }
 
+// Tell the server a track really started (prefetched tracks may never play),
+// so only real plays count towards the on-disk audio cache.
+function reportPlayed(track) {
+    if (track.is_intro || !track.video_id) return;
+    authenticatedFetch(`${API_URL}/played`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ id: track.video_id, title: track.title, duration: track.duration || null })
+    }).catch(e => console.error("Play report failed:", e));
+}
+
 async function prefetchNext() {
     if (currentIndex < currentQueue.length - 1) {
         const nextTrack = currentQueue[currentIndex + 1];
@@ -304,11 +325,13 @@ async function prefetchNext() {
 
         console.log("Prefetching next:", nextTrack.title);
         try {
-            const res = await authenticatedFetch(`${API_URL}/resolve?q=${encodeURIComponent(nextTrack.title)}`);
+            const res = await authenticatedFetch(resolveUrlFor(nextTrack));
             if (res.ok) {
                 const data = await res.json();
                 nextTrack.url = data.url;
                 nextTrack.thumbnail = data.thumbnail;
+                nextTrack.video_id = data.id;
+                nextTrack.duration = data.duration;
                 nextTrack.resolved = true; // Mark as resolved
                 console.log("Prefetch complete:", nextTrack.title);
                 updateQueueUI(); // Update UI to show thumb if it changed
@@ -1340,19 +1363,25 @@ async function sendChatMessage() {
     scrollToBottom();
 
     try {
-        const res = await authenticatedFetch(`${API_URL}/chat`, {
+        // Streaming (SSE): la burbuja se va llenando según llegan los trozos
+        const res = await authenticatedFetch(`${API_URL}/chat/stream`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ message: msg })
         });
-
-        const data = await res.json();
-
-        // Remove loading bubble
-        document.getElementById(loadingId).remove();
-
-        // Render Bot Message
-        addChatBubble(data.response, "bot");
+        if (!res.ok || !res.body) throw new Error("Chat stream failed");
+
+        const bubble = document.getElementById(loadingId);
+        let text = "";
+        await readChatStream(res, (event, data) => {
+            if (event === "message" && data.delta) {
+                text += data.delta;
+                bubble.innerText = text;
+                scrollToBottom();
+            } else if (event === "done" || event === "error") {
+                bubble.innerText = data.response || text;
+            }
+        });
 
     } catch (e) {
         document.getElementById(loadingId).remove();
@@ -1362,6 +1391,34 @@ async function sendChatMessage() {
     scrollToBottom();
 }
 
+// Parser mínimo de Server-Sent Events sobre fetch (EventSource no permite POST)
+async function readChatStream(res, onEvent) {
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Cada evento termina en una línea en blanco
+        let sep;
+        while ((sep = buffer.indexOf("\n\n")) !== -1) {
+            const raw = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+
+            let event = "message";
+            let data = "";
+            raw.split("\n").forEach(line => {
+                if (line.startsWith("event:")) event = line.slice(6).trim();
+                else if (line.startsWith("data:")) data += line.slice(5).trim();
+            });
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+}
+
 function addChatBubble(text, type) {
     const container = document.getElementById("chat-messages");
     const bubble = document.createElement("div");
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# config.py exige estas variables y lee settings.json relativo al directorio de trabajo
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DISCORD_TOKEN", "test-token")
+os.environ.setdefault("GEMINI_KEY", "test-key")
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(autouse=True)
+def temp_db(tmp_path, monkeypatch):
+    """Cada test trabaja sobre una base temporal (nunca data/memory.db)."""
+    from utils import database
+    monkeypatch.setattr(database, "DB_NAME", str(tmp_path / "test.db"))
+    database.ensure_db()
+    yield
+    database.close_pool()
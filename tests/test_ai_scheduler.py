@@ -0,0 +1,32 @@
+import asyncio
+import time
+
+import pytest
+
+from utils.ai_scheduler import (
+    PriorityScheduler, AIOverloaded, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+)
+
+
+def test_low_priority_waiter_expires_behind_higher_priority():
+    async def run():
+        # Un token cada 10 s: tras gastar el primero nadie obtiene turno durante el test
+        scheduler = PriorityScheduler(rate_per_minute=6, burst=1, max_queue=10,
+                                      deadlines={PRIORITY_INTERACTIVE: 30, PRIORITY_BACKGROUND: 0.3})
+        await scheduler.acquire(PRIORITY_INTERACTIVE)
+
+        interactive = asyncio.create_task(scheduler.acquire(PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+        start = time.monotonic()
+        with pytest.raises(AIOverloaded):
+            await scheduler.acquire(PRIORITY_BACKGROUND)
+        elapsed = time.monotonic() - start
+
+        assert not interactive.done() # Sigue esperando su token
+        interactive.cancel()
+        return scheduler, elapsed
+
+    scheduler, elapsed = asyncio.run(run())
+    assert elapsed < 1.0
+    assert scheduler.shed[PRIORITY_BACKGROUND] == 1
+    assert scheduler.shed[PRIORITY_INTERACTIVE] == 0
@@ -0,0 +1,20 @@
+import asyncio
+
+from utils import chat_context, database
+
+
+def test_summary_scheduled_when_old_messages_fall_outside_fetch(monkeypatch):
+    user_id = 42
+    # Más mensajes cortos que CHAT_WINDOW_MAX_MESSAGES: todos los que se leen caben en el presupuesto
+    for i in range(200):
+        database.add_chat_message(user_id, "user" if i % 2 == 0 else "model", f"mensaje corto {i}")
+
+    scheduled = []
+    monkeypatch.setattr(chat_context, "schedule_summary", lambda uid, before_id: scheduled.append((uid, before_id)))
+
+    history = asyncio.run(chat_context.build_context(user_id))
+
+    first_id = database.get_chat_rows(user_id, limit=1, oldest_first=True)[0][0]
+    window_start = database.get_chat_rows(user_id, limit=len(history))[0][0]
+    assert scheduled == [(user_id, window_start)]
+    assert window_start > first_id
@@ -0,0 +1,17 @@
+from utils.memory_index import UserMemoryIndex
+
+
+def test_long_negated_fact_is_not_a_duplicate():
+    index = UserMemoryIndex()
+    index.add("Le gusta mucho la música rock pesada alemana de los noventa")
+
+    assert index.find_duplicate("no le gusta mucho la musica rock pesada alemana de los noventa", 0.9) is None
+    assert index.find_duplicate("le gusta mucho la musica rock pesada alemana de los noventa", 0.9) is not None
+
+
+def test_negated_fact_matches_its_own_duplicate():
+    index = UserMemoryIndex()
+    index.add("Le gusta el jazz")
+    index.add("Nunca escucha reggaetón en el coche ni en casa")
+
+    assert index.find_duplicate("nunca escucha reggaeton en el coche ni en casa", 0.9) == "Nunca escucha reggaetón en el coche ni en casa"
@@ -0,0 +1,28 @@
+import asyncio
+
+from utils.music_core import MusicCore
+
+
+def test_stream_cache_keys_non_youtube_urls_separately():
+    async def run():
+        core = MusicCore()
+        calls = []
+
+        async def fake_extract(kind, target):
+            calls.append(target)
+            return {'id': target.rsplit('/', 1)[-1], 'title': target, 'url': f"{target}/stream.mp3"}
+
+        core.extractor.extract = fake_extract
+        try:
+            first = await core.get_stream_url("https://soundcloud.com/artist/track-a")
+            second = await core.get_stream_url("https://example.com/audio/track-b")
+            again = await core.get_stream_url("https://soundcloud.com/artist/track-a")
+        finally:
+            core.extractor.shutdown()
+        return calls, first, second, again
+
+    calls, first, second, again = asyncio.run(run())
+    assert first['url'] == "https://soundcloud.com/artist/track-a/stream.mp3"
+    assert second['url'] == "https://example.com/audio/track-b/stream.mp3"
+    assert again == first
+    assert calls == ["https://soundcloud.com/artist/track-a", "https://example.com/audio/track-b"]
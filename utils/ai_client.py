@@ -0,0 +1,148 @@
+import time
+import json
+import asyncio
+import google.generativeai as genai
+import config
+from utils.ai_scheduler import PriorityScheduler, PRIORITY_INTERACTIVE, PRIORITY_GREETING, PRIORITY_BACKGROUND
+from utils.logger import setup_logger
+
+logger = setup_logger("AIClient")
+
+# Cliente compartido de Gemini (bot y web): se configura una sola vez por proceso y los
+# GenerativeModel se reutilizan por (modelo, generation_config), así el transporte de la
+# librería sigue vivo entre llamadas en vez de recrearse en cada petición.
+
+_configured = False
+_models = {} # {(model_name, config_json): GenerativeModel}
+
+# Contadores
+_stats = {'calls': 0, 'errors': 0, 'timeouts': 0, 'retries': 0, 'total_ms': 0.0}
+
+# Todas las llamadas pasan por aquí: token bucket + colas por prioridad (ver ai_scheduler)
+scheduler = PriorityScheduler(
+    rate_per_minute=config.AI_RATE_PER_MINUTE,
+    burst=config.AI_BURST,
+    max_queue=config.AI_MAX_QUEUE,
+    deadlines={
+        PRIORITY_INTERACTIVE: config.AI_DEADLINE_INTERACTIVE,
+        PRIORITY_GREETING: config.AI_DEADLINE_GREETING,
+        PRIORITY_BACKGROUND: config.AI_DEADLINE_BACKGROUND,
+    }
+)
+
+
+def _configure():
+    global _configured
+    if not _configured:
+        genai.configure(api_key=config.GEMINI_KEY)
+        _configured = True
+
+
+def get_model(model_name=None, generation_config=None):
+    """Retorna el GenerativeModel compartido para ese nombre + configuración (lo crea la primera vez)."""
+    _configure()
+    model_name = model_name or config.AI_MODEL
+    key = (model_name, json.dumps(generation_config or {}, sort_keys=True))
+    model = _models.get(key)
+    if model is None:
+        model = genai.GenerativeModel(model_name, generation_config=generation_config)
+        _models[key] = model
+        logger.info(f"Modelo Gemini listo: {model_name} {generation_config or ''}")
+    return model
+
+
+def _is_quota_error(e):
+    return getattr(e, 'code', None) == 429 or "429" in str(e) or type(e).__name__ == "ResourceExhausted"
+
+
+async def _timed(coro_factory, retries, priority):
+    """Espera turno en el scheduler y ejecuta la llamada con timeout, reintentos y métricas."""
+    attempt = 0
+    while True:
+        await scheduler.acquire(priority) # AIOverloaded si no hay hueco a tiempo
+        start = time.perf_counter()
+        _stats['calls'] += 1
+        try:
+            return await asyncio.wait_for(coro_factory(), timeout=config.AI_TIMEOUT)
+        except asyncio.TimeoutError:
+            _stats['timeouts'] += 1
+            error = "timeout"
+            if attempt >= retries:
+                _stats['errors'] += 1
+                raise
+        except Exception as e:
+            error = e
+            if _is_quota_error(e):
+                # 429: frenar a todos (no solo a este reintento) para no entrar en tormenta
+                scheduler.backoff(config.AI_QUOTA_BACKOFF)
+            if attempt >= retries:
+                _stats['errors'] += 1
+                raise
+        finally:
+            _stats['total_ms'] += (time.perf_counter() - start) * 1000
+
+        attempt += 1
+        _stats['retries'] += 1
+        logger.warning(f"Gemini falló ({error}), reintento {attempt}/{retries}")
+        await asyncio.sleep(0.5 * attempt)
+
+
+async def generate(prompt, model_name=None, generation_config=None, retries=None, priority=PRIORITY_INTERACTIVE):
+    """generate_content_async sobre el modelo compartido. prompt puede ser str o lista (texto + imagen)."""
+    model = get_model(model_name, generation_config)
+    retries = config.AI_RETRIES if retries is None else retries
+    return await _timed(lambda: model.generate_content_async(prompt), retries, priority)
+
+
+def start_chat(history=None, model_name=None, generation_config=None):
+    """Sesión de chat sobre el modelo compartido."""
+    return get_model(model_name, generation_config).start_chat(history=history or [])
+
+
+async def send_message(chat, message, priority=PRIORITY_INTERACTIVE):
+    """send_message_async con timeout y métricas. Sin reintentos: la sesión guarda historial."""
+    return await _timed(lambda: chat.send_message_async(message), 0, priority)
+
+
+async def send_message_stream(chat, message, priority=PRIORITY_INTERACTIVE):
+    """
+    Generador async de trozos de texto (send_message_async con stream=True).
+    El timeout cubre hasta el primer chunk; sin reintentos (puede haber salido texto ya).
+    """
+    await scheduler.acquire(priority)
+    start = time.perf_counter()
+    _stats['calls'] += 1
+    try:
+        response = await asyncio.wait_for(chat.send_message_async(message, stream=True), timeout=config.AI_TIMEOUT)
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                continue # Chunk sin texto (ej: solo metadatos de seguridad)
+            if text:
+                yield text
+    except asyncio.TimeoutError:
+        _stats['timeouts'] += 1
+        _stats['errors'] += 1
+        raise
+    except Exception as e:
+        _stats['errors'] += 1
+        if _is_quota_error(e):
+            scheduler.backoff(config.AI_QUOTA_BACKOFF)
+        raise
+    finally:
+        _stats['total_ms'] += (time.perf_counter() - start) * 1000
+
+
+def stats():
+    """Contadores de llamadas a Gemini (para !status / endpoints de estado)."""
+    calls = _stats['calls']
+    return {
+        'models': len(_models),
+        'calls': calls,
+        'errors': _stats['errors'],
+        'timeouts': _stats['timeouts'],
+        'retries': _stats['retries'],
+        'avg_ms': int(_stats['total_ms'] / calls) if calls else 0,
+        'scheduler': scheduler.stats()
+    }
@@ -1,6 +1,5 @@
 
-import google.generativeai as genai
-import config
+from utils import ai_client
 from utils.logger import setup_logger
 
 logger = setup_logger("AICore")
@@ -11,19 +10,22 @@ async def generate_response(message, history):
     history: Lista de dicts [{'role': 'user'|'model', 'parts': [{'text': ...}]}]
     """
     try:
-        genai.configure(api_key=config.GEMINI_KEY)
-        model = genai.GenerativeModel(config.AI_MODEL)
-        
-        # Start chat with history
-        chat = model.start_chat(history=history)
+        # Start chat with history (modelo compartido de ai_client)
+        chat = ai_client.start_chat(history=history)
         
         # Send message
-        # Note: Gemini async methods might vary by version. 
-        # using send_message_async if available, or run_in_executor
-        
-        resp = await chat.send_message_async(message)
+        resp = await ai_client.send_message(chat, message)
         return resp.text
         
     except Exception as e:
         logger.error(f"AI Generation Error: {e}")
         return "Lo siento, me he mareado un poco. ¿Dices?"
+
+async def stream_response(message, history):
+    """
+    Igual que generate_response, pero va devolviendo el texto por trozos según llega de Gemini.
+    Lanza la excepción si falla (el que consume decide qué mostrar).
+    """
+    chat = ai_client.start_chat(history=history)
+    async for text in ai_client.send_message_stream(chat, message):
+        yield text
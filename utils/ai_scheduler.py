@@ -0,0 +1,142 @@
+import time
+import heapq
+import itertools
+import asyncio
+from utils.logger import setup_logger
+
+logger = setup_logger("AIScheduler")
+
+# Clases de prioridad (menor = antes)
+PRIORITY_INTERACTIVE = 0 # !chat, !ver, !asuka, /api/chat
+PRIORITY_GREETING = 1    # Saludos de voz
+PRIORITY_BACKGROUND = 2  # Prefetch de la radio
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_GREETING: "greeting",
+    PRIORITY_BACKGROUND: "background",
+}
+
+
+class AIOverloaded(Exception):
+    """La petición se descartó: cola llena o no consiguió turno antes de su deadline."""
+    pass
+
+
+class PriorityScheduler:
+    """
+    Token bucket (rate_per_minute, con ráfagas de hasta `burst`) compartido por todas las llamadas
+    a Gemini. Cuando no hay tokens, las peticiones esperan en una cola por prioridad: la radio nunca
+    adelanta a un usuario. Cada clase tiene cola acotada y un deadline; lo que no entra a tiempo se
+    descarta (AIOverloaded) en vez de acumularse y salir en ráfaga contra la cuota.
+    """
+    def __init__(self, rate_per_minute, burst, max_queue, deadlines):
+        self.rate = rate_per_minute / 60.0 # tokens por segundo
+        self.burst = burst
+        self.max_queue = max_queue
+        self.deadlines = deadlines # {priority: segundos}
+
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._heap = [] # [(priority, seq, deadline, future)]
+        self._seq = itertools.count()
+        self._dispatcher = None
+
+        # Contadores por prioridad
+        self.granted = {p: 0 for p in PRIORITY_NAMES}
+        self.shed = {p: 0 for p in PRIORITY_NAMES}
+        self.wait_ms = {p: 0.0 for p in PRIORITY_NAMES}
+        self.backoffs = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _queued(self, priority):
+        return sum(1 for entry in self._heap if entry[0] == priority and not entry[3].done())
+
+    async def acquire(self, priority=PRIORITY_INTERACTIVE):
+        """Espera un token. Lanza AIOverloaded si la cola está llena o se pasa el deadline."""
+        start = time.monotonic()
+        self._refill()
+
+        # Camino rápido: hay token, no hay pausa y nadie esperando
+        if not self._heap and self._tokens >= 1 and start >= self._paused_until:
+            self._tokens -= 1
+            self.granted[priority] += 1
+            return
+
+        if self._queued(priority) >= self.max_queue:
+            self.shed[priority] += 1
+            raise AIOverloaded(f"AI queue full ({PRIORITY_NAMES[priority]})")
+
+        future = asyncio.get_running_loop().create_future()
+        deadline = start + self.deadlines.get(priority, 30)
+        heapq.heappush(self._heap, (priority, next(self._seq), deadline, future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        await future # El dispatcher resuelve (turno) o lanza AIOverloaded (deadline)
+        self.wait_ms[priority] += (time.monotonic() - start) * 1000
+
+    def _shed_expired(self, now):
+        """Saca de la cola a los cancelados y descarta a todos los vencidos, no solo al primero."""
+        alive = []
+        for entry in self._heap:
+            priority, _, deadline, future = entry
+            if future.done(): # El que esperaba se canceló
+                continue
+            if now >= deadline:
+                self.shed[priority] += 1
+                future.set_exception(AIOverloaded(f"AI deadline exceeded ({PRIORITY_NAMES[priority]})"))
+                continue
+            alive.append(entry)
+        if len(alive) != len(self._heap):
+            heapq.heapify(alive)
+            self._heap = alive
+
+    async def _dispatch(self):
+        while self._heap:
+            now = time.monotonic()
+            self._shed_expired(now)
+            if not self._heap:
+                break
+            priority, _, _, future = self._heap[0]
+
+            self._refill()
+            if now >= self._paused_until and self._tokens >= 1:
+                heapq.heappop(self._heap)
+                self._tokens -= 1
+                self.granted[priority] += 1
+                future.set_result(None)
+                continue
+
+            # Dormir hasta el próximo token (o fin de la pausa), sin pasarse del deadline más cercano
+            wait = max(self._paused_until - now, (1 - self._tokens) / self.rate if self.rate else 1)
+            next_deadline = min(entry[2] for entry in self._heap) # Ninguno vencido tras _shed_expired
+            await asyncio.sleep(max(0.01, min(wait, next_deadline - now)))
+
+    def backoff(self, seconds):
+        """Gemini respondió 429: vaciar el bucket y no soltar nada durante `seconds`."""
+        self._tokens = 0.0
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.backoffs += 1
+        logger.warning(f"Cuota de Gemini agotada: pausando {seconds}s")
+
+    def stats(self):
+        out = {
+            'rate_per_minute': int(self.rate * 60),
+            'tokens': round(self._tokens, 2),
+            'queued': len([e for e in self._heap if not e[3].done()]),
+            'backoffs': self.backoffs,
+        }
+        for priority, name in PRIORITY_NAMES.items():
+            granted = self.granted[priority]
+            out[name] = {
+                'granted': granted,
+                'shed': self.shed[priority],
+                'avg_wait_ms': int(self.wait_ms[priority] / granted) if granted else 0
+            }
+        return out
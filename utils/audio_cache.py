@@ -0,0 +1,140 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import yt_dlp
+from utils import database
+from utils.ytdl_pool import _QuietLogger
+from utils.logger import setup_logger
+
+logger = setup_logger("AudioCache")
+
+
+class AudioCache:
+    """
+    Cache en disco de las canciones que más se repiten.
+    Cada reproducción suma un contador (tabla audio_cache); al llegar a `min_plays` el audio se
+    descarga en segundo plano como Opus a `directory`. Si el total supera `max_bytes` se borran
+    los archivos menos escuchados recientemente (LRU por last_played).
+    """
+    def __init__(self, directory, max_bytes, min_plays=3, max_duration=900, enabled=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.min_plays = min_plays
+        self.max_duration = max_duration
+        self.enabled = enabled
+
+        self._downloading = set() # video_ids en descarga
+        self._executor = None
+
+        # Contadores
+        self.hits = 0
+        self.misses = 0
+        self.downloads = 0
+        self.evictions = 0
+
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+            # Un solo hilo: las descargas son de fondo y no deben competir con la extracción
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audiocache")
+            self._download_opts = {
+                'format': 'bestaudio[acodec=opus]/bestaudio/best',
+                'outtmpl': os.path.join(self.directory, '%(id)s.%(ext)s'),
+                'noplaylist': True,
+                'quiet': True,
+                'nocheckcertificate': True,
+                'logger': _QuietLogger(),
+                # Stream Opus (itag 251) -> .opus sin re-codificar; otros formatos se convierten
+                'postprocessors': [{'key': 'FFmpegExtractAudio', 'preferredcodec': 'opus'}],
+            }
+
+    def lookup(self, video_id):
+        """Retorna la entrada local ({'path', 'title', 'duration', ...}) o None. No toca la red."""
+        if not self.enabled or not video_id:
+            return None
+
+        entry = database.get_cached_audio(video_id)
+        if entry and not os.path.exists(entry['path']):
+            # Alguien borró el archivo a mano: olvidarlo
+            database.set_cached_audio(video_id, None, 0)
+            entry = None
+
+        if entry:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return entry
+
+    def record_play(self, video_id, title=None, duration=None):
+        """Cuenta una reproducción y lanza la descarga si el video pasa el umbral."""
+        if not self.enabled or not video_id:
+            return
+
+        plays, path = database.record_audio_play(video_id, title, duration)
+        if path or plays < self.min_plays or video_id in self._downloading:
+            return
+        if duration and duration > self.max_duration:
+            return
+
+        self._downloading.add(video_id)
+        asyncio.create_task(self._download(video_id))
+
+    async def _download(self, video_id):
+        loop = asyncio.get_running_loop()
+        try:
+            path = await loop.run_in_executor(self._executor, self._download_blocking, video_id)
+            if not path:
+                return
+            size = os.path.getsize(path)
+            database.set_cached_audio(video_id, path, size)
+            self.downloads += 1
+            logger.info(f"💾 Audio guardado en cache: {video_id} ({size // 1024} KB)")
+            self._enforce_quota(keep=video_id)
+        except Exception as e:
+            logger.error(f"Error downloading {video_id} to audio cache: {e}")
+        finally:
+            self._downloading.discard(video_id)
+
+    def _download_blocking(self, video_id):
+        """Bloqueante: corre en el hilo de la cache."""
+        with yt_dlp.YoutubeDL(self._download_opts) as ytdl:
+            ytdl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=True)
+        path = os.path.join(self.directory, f"{video_id}.opus")
+        return path if os.path.exists(path) else None
+
+    def _enforce_quota(self, keep=None):
+        """Borra archivos LRU hasta quedar bajo max_bytes (nunca el recién descargado)."""
+        _, used = database.get_audio_cache_usage()
+        while used > self.max_bytes:
+            victims = database.get_audio_cache_lru(exclude_id=keep)
+            if not victims:
+                break
+            for video_id, path, size in victims:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                # Conserva el contador de reproducciones: si vuelve a sonar, se descarga otra vez
+                database.set_cached_audio(video_id, None, 0)
+                self.evictions += 1
+                used -= size
+                if used <= self.max_bytes:
+                    break
+
+    def stats(self):
+        """Contadores en el mismo formato que TTLCache.stats(), más uso de disco."""
+        files, used = database.get_audio_cache_usage() if self.enabled else (0, 0)
+        total = self.hits + self.misses
+        return {
+            'size': files,
+            'bytes': used,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'downloads': self.downloads,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0
+        }
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
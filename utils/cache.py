@@ -0,0 +1,163 @@
+import time
+import asyncio
+import json
+import re
+from collections import OrderedDict
+from utils import database
+from utils.logger import setup_logger
+
+logger = setup_logger("Cache")
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_query(query):
+    """
+    Normaliza una query para usarla como clave de cache.
+    'Daft Punk  One More Time' y 'daft punk one more time' comparten clave.
+    Las URLs solo se recortan (los IDs de YouTube distinguen mayúsculas).
+    """
+    if not query:
+        return ""
+    query = query.strip()
+    if query.startswith("http"):
+        return query
+    return _WHITESPACE.sub(" ", query).casefold()
+
+
+class TTLCache:
+    """
+    Cache LRU con tamaño máximo y TTL por entrada.
+    Si se indica `namespace`, las entradas se persisten en SQLite (tabla cache_entries)
+    y se recargan al crear la instancia (warm start).
+    """
+    def __init__(self, max_entries=512, ttl=3600, namespace=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.namespace = namespace
+        self._data = OrderedDict() # {key: (expires_at, value)}
+
+        # Contadores
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if self.namespace:
+            self._warm_load()
+
+    def _warm_load(self):
+        rows = database.load_cache_entries(self.namespace, self.max_entries)
+        now = time.time()
+        # Las filas vienen de la más antigua a la más reciente (orden LRU)
+        for key, value_json, expires_at in rows:
+            if expires_at <= now:
+                continue
+            try:
+                self._data[key] = (expires_at, json.loads(value_json))
+            except (TypeError, ValueError):
+                continue
+        if self._data:
+            logger.info(f"Cache '{self.namespace}' precargada con {len(self._data)} entradas.")
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.time():
+            # Expirada: borrar y contar como fallo
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            if self.namespace:
+                database.delete_cache_entry(self.namespace, key)
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (ttl if ttl is not None else self.ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+
+        if self.namespace:
+            try:
+                database.save_cache_entry(self.namespace, key, json.dumps(value), expires_at)
+            except (TypeError, ValueError) as e:
+                logger.error(f"Cache '{self.namespace}': valor no serializable para {key}: {e}")
+
+        # Expulsar las menos usadas si nos pasamos del límite
+        while len(self._data) > self.max_entries:
+            old_key, _ = self._data.popitem(last=False)
+            self.evictions += 1
+            if self.namespace:
+                database.delete_cache_entry(self.namespace, old_key)
+
+    def invalidate(self, key):
+        if self._data.pop(key, None) is not None and self.namespace:
+            database.delete_cache_entry(self.namespace, key)
+
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > time.time()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Retorna los contadores de la cache (para logs / endpoints de estado)."""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0
+        }
+
+
+class SingleFlight:
+    """
+    Deduplica llamadas async concurrentes con la misma clave:
+    el primero lanza la tarea y el resto espera el mismo futuro.
+    """
+    def __init__(self):
+        self._inflight = {} # {key: asyncio.Future}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key, coro_factory):
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            future = asyncio.ensure_future(coro_factory())
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._forget(key, f))
+
+        # shield: si un cliente cancela (ej: cierra la web), la extracción compartida sigue
+        return await asyncio.shield(future)
+
+    def _forget(self, key, future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        # Evitar "exception was never retrieved" si todos los que esperaban se cancelaron
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self):
+        """Retorna los contadores en el mismo formato que TTLCache.stats()."""
+        total = self.calls + self.coalesced
+        return {
+            'size': len(self._inflight),
+            'hits': self.coalesced,
+            'misses': self.calls,
+            'hit_rate': round(self.coalesced / total, 3) if total else 0.0
+        }
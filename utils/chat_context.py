@@ -0,0 +1,92 @@
+import asyncio
+import config
+from utils import database
+from utils import ai_client
+from utils.logger import setup_logger
+
+logger = setup_logger("ChatContext")
+
+# Contexto de chat con presupuesto de tokens:
+#   [resumen de lo antiguo] + [últimos turnos que caben en CHAT_CONTEXT_TOKENS]
+# Lo que sale de la ventana se va plegando en el resumen (tabla chat_summaries) en segundo plano.
+
+_refreshing = set() # {user_id} con resumen en curso
+
+
+def estimate_tokens(text):
+    """Aproximación barata (~4 caracteres por token); suficiente para un presupuesto."""
+    return len(text or "") // 4 + 1
+
+
+async def build_context(user_id):
+    """
+    Retorna el historial para start_chat(): resumen (si hay) + ventana reciente dentro del presupuesto.
+    Si quedan bastantes mensajes fuera de la ventana sin resumir, lanza el resumen en background.
+    """
+    summary, summarized_upto = database.get_chat_summary(user_id)
+    rows = database.get_chat_rows(user_id, after_id=summarized_upto, limit=config.CHAT_WINDOW_MAX_MESSAGES)
+
+    budget = config.CHAT_CONTEXT_TOKENS - (estimate_tokens(summary) if summary else 0)
+    window = []
+    for row in reversed(rows):
+        cost = estimate_tokens(row[2])
+        if window and cost > budget:
+            break
+        window.insert(0, row)
+        budget -= cost
+
+    # Gemini espera que el historial empiece por el usuario
+    while window and window[0][1] != "user":
+        window.pop(0)
+
+    # Mensajes sin resumir anteriores a la ventana: incluye los que ni entraron en `rows`
+    # (tope CHAT_WINDOW_MAX_MESSAGES), que si no se perderían sin resumir
+    if window:
+        window_start = window[0][0]
+        pending = database.count_chat_messages(user_id, after_id=summarized_upto, before_id=window_start)
+        if pending >= config.CHAT_SUMMARY_BATCH:
+            schedule_summary(user_id, window_start)
+
+    history = []
+    if summary:
+        history.append({"role": "user", "parts": [{"text": f"(Resumen de nuestras conversaciones anteriores: {summary})"}]})
+        history.append({"role": "model", "parts": [{"text": "Entendido, lo tengo presente."}]})
+    history.extend({"role": role, "parts": [{"text": content}]} for _, role, content in window)
+    return history
+
+
+def schedule_summary(user_id, before_id):
+    """Pliega en el resumen los mensajes anteriores a before_id (uno a la vez por usuario)."""
+    if user_id in _refreshing:
+        return
+    _refreshing.add(user_id)
+    asyncio.create_task(_refresh_summary(user_id, before_id))
+
+
+async def _refresh_summary(user_id, before_id):
+    try:
+        summary, summarized_upto = database.get_chat_summary(user_id)
+        # Por tandas (los más antiguos primero) para que el prompt del resumen también sea pequeño
+        while True:
+            rows = database.get_chat_rows(user_id, after_id=summarized_upto, before_id=before_id,
+                                          limit=config.CHAT_SUMMARY_BATCH, oldest_first=True)
+            if not rows:
+                break
+
+            transcript = "\n".join(f"{'Usuario' if role == 'user' else 'Asuka'}: {content}" for _, role, content in rows)
+            prompt = (
+                "Mantienes la memoria de una conversación entre un usuario y Asuka (un bot de música). "
+                f"RESUMEN ACTUAL: {summary or '(vacío)'}\n"
+                f"MENSAJES NUEVOS:\n{transcript}\n"
+                f"Escribe el resumen actualizado (máx {config.CHAT_SUMMARY_MAX_WORDS} palabras): datos del usuario, "
+                "gustos, temas pendientes y lo importante de lo hablado. Solo el resumen, sin introducciones."
+            )
+            resp = await ai_client.generate(prompt, priority=ai_client.PRIORITY_BACKGROUND)
+            summary = resp.text.strip()
+            summarized_upto = rows[-1][0]
+            database.save_chat_summary(user_id, summary, summarized_upto)
+            logger.info(f"Resumen de chat actualizado para {user_id} (hasta mensaje {summarized_upto})")
+    except Exception as e:
+        logger.error(f"Error summarizing chat for {user_id}: {e}")
+    finally:
+        _refreshing.discard(user_id)
@@ -0,0 +1,127 @@
+import time
+from collections import OrderedDict
+from utils import database
+from utils import ai_client
+from utils.chat_context import estimate_tokens
+from utils.logger import setup_logger
+
+logger = setup_logger("ChatSessions")
+
+
+class ChatSessions:
+    """
+    Sesiones de chat de Discord (una por servidor o DM) con ciclo de vida acotado:
+    - LRU con tope `max_sessions` y expiración por inactividad (`idle_ttl` segundos).
+    - Cada sesión guarda turnos compactos (la pregunta del usuario, no el prompt con todo el
+      contexto) y a Gemini solo le llega la ventana reciente que cabe en `context_tokens`.
+    - Los turnos se persisten (tabla discord_chat_log, últimos `transcript_max`): una sesión
+      expulsada se rehidrata desde ahí la próxima vez que alguien habla.
+    """
+    def __init__(self, max_sessions, idle_ttl, context_tokens, transcript_max, generation_config=None):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.context_tokens = context_tokens
+        self.transcript_max = transcript_max
+        self.generation_config = generation_config
+
+        self._sessions = OrderedDict() # {session_id: {'turns': [(role, text)], 'last_used': monotonic}}
+
+        # Contadores
+        self.created = 0
+        self.rehydrated = 0
+        self.evicted = 0
+        self.expired = 0
+        self.turns = 0
+        self.prompt_tokens = 0
+        self.max_prompt_tokens = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _sweep(self):
+        """Expulsa las sesiones inactivas (las más viejas están al principio)."""
+        now = time.monotonic()
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if now - entry['last_used'] <= self.idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.expired += 1
+            logger.info(f"Sesión de IA expirada por inactividad: {session_id}")
+
+    def _get(self, session_id):
+        """Retorna la entrada de la sesión; si no está en memoria la rehidrata desde la DB."""
+        self._sweep()
+        entry = self._sessions.get(session_id)
+        if entry is not None:
+            self._sessions.move_to_end(session_id)
+            entry['last_used'] = time.monotonic()
+            return entry
+
+        turns = database.get_discord_chat_log(session_id, limit=self.transcript_max)
+        if turns:
+            self.rehydrated += 1
+            logger.info(f"Sesión de IA rehidratada para ID: {session_id} ({len(turns)} turnos)")
+        else:
+            self.created += 1
+            logger.info(f"Creada nueva sesión de IA para ID: {session_id}")
+
+        entry = {'turns': turns, 'last_used': time.monotonic()}
+        self._sessions[session_id] = entry
+        while len(self._sessions) > self.max_sessions:
+            evicted_id, _ = self._sessions.popitem(last=False)
+            self.evicted += 1
+            logger.info(f"Sesión de IA expulsada (LRU): {evicted_id}")
+        return entry
+
+    def window(self, turns, budget):
+        """Historial para start_chat(): los turnos más recientes que caben en `budget` tokens."""
+        window = []
+        for role, text in reversed(turns):
+            cost = estimate_tokens(text)
+            if window and cost > budget:
+                break
+            window.insert(0, (role, text))
+            budget -= cost
+
+        # Gemini espera que el historial empiece por el usuario
+        while window and window[0][0] != "user":
+            window.pop(0)
+        return [{"role": role, "parts": [{"text": text}]} for role, text in window]
+
+    async def send(self, session_id, prompt, user_text=None, priority=ai_client.PRIORITY_INTERACTIVE):
+        """
+        Envía `prompt` con el historial recortado de la sesión y guarda el turno.
+        `user_text` es la versión compacta que queda en el historial (por defecto, el prompt).
+        """
+        entry = self._get(session_id)
+        history = self.window(entry['turns'], self.context_tokens)
+
+        prompt_tokens = estimate_tokens(prompt) + sum(estimate_tokens(h["parts"][0]["text"]) for h in history)
+        self.turns += 1
+        self.prompt_tokens += prompt_tokens
+        self.max_prompt_tokens = max(self.max_prompt_tokens, prompt_tokens)
+
+        chat = ai_client.start_chat(history, generation_config=self.generation_config)
+        response = await ai_client.send_message(chat, prompt, priority=priority)
+
+        # Turno completo (pregunta + respuesta) de una vez: dos !chat simultáneos no se intercalan
+        new_turns = [("user", user_text or prompt), ("model", response.text)]
+        entry['turns'].extend(new_turns)
+        del entry['turns'][:-self.transcript_max]
+        database.add_discord_chat_turns(session_id, new_turns, keep=self.transcript_max)
+        return response
+
+    def stats(self):
+        self._sweep()
+        return {
+            'sessions': len(self._sessions),
+            'max_sessions': self.max_sessions,
+            'created': self.created,
+            'rehydrated': self.rehydrated,
+            'evicted': self.evicted,
+            'expired': self.expired,
+            'turns': self.turns,
+            'avg_prompt_tokens': int(self.prompt_tokens / self.turns) if self.turns else 0,
+            'max_prompt_tokens': self.max_prompt_tokens
+        }
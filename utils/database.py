@@ -2,35 +2,162 @@ import sqlite3
 import os
 from utils.logger import setup_logger
 import threading
+import queue
+import time
 
 logger = setup_logger("Database")
 DB_NAME = "data/memory.db"
-db_lock = threading.Lock()
+
+# Pool de conexiones (ver ConnectionPool)
+DB_READERS = 4             # Conexiones de solo lectura (lecturas concurrentes)
+DB_BUSY_TIMEOUT_MS = 5000  # Espera si el otro proceso (bot/web) tiene el lock de escritura
+DB_CACHE_KB = 16384        # cache_size por conexión
+DB_MMAP_BYTES = 64 * 1024 * 1024
+DB_STATEMENT_CACHE = 256   # Sentencias preparadas reutilizadas por conexión
+
+
+class ConnectionPool:
+    """
+    Conexiones persistentes a SQLite en modo WAL:
+    - Un escritor (una conexión, un lock): las escrituras se serializan como siempre.
+    - Hasta `readers` lectores (query_only) que leen en paralelo entre sí y con el escritor.
+    Al no cerrarse, cada conexión conserva su cache de páginas y sus sentencias preparadas.
+    """
+    def __init__(self, path, readers=DB_READERS):
+        self.path = path
+        self.max_readers = readers
+        self.write_lock = threading.Lock()
+        self._writer = None
+        self._readers = queue.LifoQueue() # LIFO: reutilizar la conexión con la cache más caliente
+        self._reader_count = 0
+        self._reader_count_lock = threading.Lock()
+
+    def _connect(self, readonly):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        # isolation_level=None: las transacciones las abre DBConnection (BEGIN / BEGIN IMMEDIATE)
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None,
+                               cached_statements=DB_STATEMENT_CACHE)
+        conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA journal_mode=WAL") # Persistente en el archivo; lectores no bloquean al escritor
+        conn.execute("PRAGMA synchronous=NORMAL") # Seguro en WAL (solo se puede perder el último commit si cae el SO)
+        conn.execute(f"PRAGMA cache_size=-{DB_CACHE_KB}")
+        conn.execute(f"PRAGMA mmap_size={DB_MMAP_BYTES}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        if readonly:
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def writer(self):
+        """La conexión de escritura (llamar con write_lock tomado)."""
+        if self._writer is None:
+            self._writer = self._connect(readonly=False)
+        return self._writer
+
+    def acquire_reader(self):
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._reader_count_lock:
+            if self._reader_count < self.max_readers:
+                self._reader_count += 1
+                try:
+                    return self._connect(readonly=True)
+                except Exception:
+                    self._reader_count -= 1
+                    raise
+        return self._readers.get() # Todos ocupados: esperar a que se libere uno
+
+    def release_reader(self, conn):
+        self._readers.put(conn)
+
+    def close(self):
+        with self.write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        self._reader_count = 0
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Pool compartido del proceso (se recrea si cambia DB_NAME)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.path != DB_NAME:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(DB_NAME)
+        return _pool
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
 
 class DBConnection:
-    """Context Manager para manejar conexiones a SQLite de forma segura."""
+    """
+    Context Manager para manejar conexiones a SQLite de forma segura.
+    Toma una conexión del pool y abre una transacción: readonly=True usa un lector (varios a la vez,
+    snapshot consistente); por defecto usa el escritor (BEGIN IMMEDIATE, uno a la vez).
+    """
+    def __init__(self, readonly=False):
+        self.readonly = readonly
+
     def __enter__(self):
-        # Asegurar directorio antes de conectar
-        if not os.path.exists("data"):
-            os.makedirs("data")
-        
-        db_lock.acquire()
-        self.conn = sqlite3.connect(DB_NAME, check_same_thread=False)
-        return self.conn.cursor()
+        self.pool = get_pool()
+        if self.readonly:
+            self.conn = self.pool.acquire_reader()
+        else:
+            self.pool.write_lock.acquire()
+            try:
+                self.conn = self.pool.writer()
+            except Exception:
+                self.pool.write_lock.release()
+                raise
+
+        try:
+            # IMMEDIATE: el lock de escritura se pide al empezar (espera busy_timeout si lo tiene el otro proceso)
+            self.conn.execute("BEGIN" if self.readonly else "BEGIN IMMEDIATE")
+            self.cursor = self.conn.cursor()
+        except Exception:
+            self._release()
+            raise
+        return self.cursor
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         try:
+            self.cursor.close()
             if exc_type:
                 # Si hubo error, rollback
-                self.conn.rollback()
                 # No suprimimos la excepción, dejamos que se propague
+                self.conn.rollback()
             else:
                 # Si todo bien, commit
                 self.conn.commit()
         finally:
-            # Siempre cerrar y liberar lock
-            self.conn.close()
-            db_lock.release()
+            # Siempre devolver la conexión al pool y liberar lock
+            self._release()
+
+    def _release(self):
+        if self.readonly:
+            self.pool.release_reader(self.conn)
+        else:
+            self.pool.write_lock.release()
+
 
 def ensure_db():
     try:
@@ -52,6 +179,30 @@ def ensure_db():
             # Chat History
             c.execute('''CREATE TABLE IF NOT EXISTS chat_history
                          (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, role TEXT, content TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)''')
+
+            # Chat Summaries: resumen acumulado de lo que ya salió de la ventana de contexto
+            c.execute('''CREATE TABLE IF NOT EXISTS chat_summaries
+                         (user_id INTEGER PRIMARY KEY, summary TEXT, last_message_id INTEGER DEFAULT 0, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP)''')
+
+            # Discord Chat Log: turnos compactos de las sesiones de !chat / !asuka (session_id = guild o DM)
+            c.execute('''CREATE TABLE IF NOT EXISTS discord_chat_log
+                         (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id INTEGER, role TEXT, content TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)''')
+            c.execute("CREATE INDEX IF NOT EXISTS idx_discord_chat_log_session ON discord_chat_log (session_id, id)")
+
+            # Track Identity: "Artista - Canción" normalizado -> video de YouTube
+            c.execute('''CREATE TABLE IF NOT EXISTS track_identity
+                         (query_key TEXT PRIMARY KEY, video_id TEXT, title TEXT, duration INTEGER, thumbnail TEXT,
+                          hits INTEGER DEFAULT 0, created_at DATETIME DEFAULT CURRENT_TIMESTAMP, last_hit DATETIME)''')
+
+            # Persistent Caches (utils/cache.py)
+            c.execute('''CREATE TABLE IF NOT EXISTS cache_entries
+                         (namespace TEXT, key TEXT, value TEXT, expires_at REAL, stored_at REAL,
+                          PRIMARY KEY(namespace, key))''')
+            
+            # Audio Cache: contador de reproducciones por video + archivo local (path NULL = no descargado)
+            c.execute('''CREATE TABLE IF NOT EXISTS audio_cache
+                         (video_id TEXT PRIMARY KEY, title TEXT, duration INTEGER, plays INTEGER DEFAULT 0,
+                          path TEXT, size_bytes INTEGER DEFAULT 0, last_played REAL, cached_at REAL)''')
             
             # Migration check
             try:
@@ -70,7 +221,7 @@ def log_song(guild_id, user_id, title):
 
 def get_recent_songs(guild_id, limit=10):
     try:
-        with DBConnection() as c:
+        with DBConnection(readonly=True) as c:
             # Filter by Guild ID to isolate contexts
             c.execute("SELECT rowid, title FROM music_history WHERE guild_id=? ORDER BY timestamp DESC LIMIT ?", (guild_id, limit))
             rows = c.fetchall()
@@ -89,7 +240,7 @@ def add_memory(user_id, fact):
 
 def get_memory(user_id):
     try:
-        with DBConnection() as c:
+        with DBConnection(readonly=True) as c:
             c.execute("SELECT fact FROM memory WHERE user_id=?", (user_id,))
             rows = c.fetchall()
             return [row[0] for row in rows]
@@ -149,7 +300,7 @@ def save_playlist(user_id, name, songs_json):
 
 def get_playlist(user_id, name):
     try:
-        with DBConnection() as c:
+        with DBConnection(readonly=True) as c:
             c.execute("SELECT songs FROM playlists WHERE user_id=? AND name=?", (user_id, name))
             row = c.fetchone()
             return row[0] if row else None
@@ -159,7 +310,7 @@ def get_playlist(user_id, name):
 
 def get_user_playlists(user_id):
     try:
-        with DBConnection() as c:
+        with DBConnection(readonly=True) as c:
             c.execute("SELECT name, created_at FROM playlists WHERE user_id=? ORDER BY created_at DESC", (user_id,))
             rows = c.fetchall()
             return rows # [(name, date), ...]
@@ -179,7 +330,7 @@ def delete_playlist(user_id, name):
 # --- Stats System ---
 def get_user_stats(user_id):
     try:
-        with DBConnection() as c:
+        with DBConnection(readonly=True) as c:
             # Total songs
             c.execute("SELECT COUNT(*) FROM music_history WHERE user_id=?", (user_id,))
             row = c.fetchone()
@@ -223,7 +374,7 @@ def remove_favorite(user_id, title):
 
 def get_favorites(user_id):
     try:
-        with DBConnection() as c:
+        with DBConnection(readonly=True) as c:
             c.execute("SELECT title FROM favorites WHERE user_id=? ORDER BY added_at DESC", (user_id,))
             rows = c.fetchall()
             return [row[0] for row in rows]
@@ -233,7 +384,7 @@ def get_favorites(user_id):
 
 def is_favorite(user_id, title):
     try:
-        with DBConnection() as c:
+        with DBConnection(readonly=True) as c:
             c.execute("SELECT 1 FROM favorites WHERE user_id=? AND title=?", (user_id, title))
             return c.fetchone() is not None
     except Exception as e:
@@ -259,7 +410,7 @@ def create_user(username, password_hash):
 def verify_user_login(username):
     """Retorna (id, password_hash) si existe, o None."""
     try:
-        with DBConnection() as c:
+        with DBConnection(readonly=True) as c:
             c.execute("SELECT id, password_hash FROM users WHERE username = ?", (username,))
             return c.fetchone()
     except Exception as e:
@@ -276,7 +427,7 @@ def add_chat_message(user_id, role, content):
 
 def get_chat_history(user_id, limit=50):
     try:
-        with DBConnection() as c:
+        with DBConnection(readonly=True) as c:
             # Get latest N messages, then sort by timestamp ASC for context
             c.execute("""
                 SELECT role, content FROM (
@@ -290,3 +441,226 @@ def get_chat_history(user_id, limit=50):
     except Exception as e:
         logger.error(f"Error fetching chat history: {e}")
         return []
+
+def get_chat_rows(user_id, after_id=0, before_id=None, limit=200, oldest_first=False):
+    """
+    Retorna [(id, role, content), ...] en orden cronológico con after_id < id < before_id.
+    Por defecto los `limit` más recientes; oldest_first=True toma los `limit` más antiguos.
+    """
+    try:
+        with DBConnection(readonly=True) as c:
+            order = "ASC" if oldest_first else "DESC"
+            c.execute(f"""
+                SELECT id, role, content FROM (
+                    SELECT id, role, content FROM chat_history
+                    WHERE user_id=? AND id>? AND id<?
+                    ORDER BY id {order} LIMIT ?
+                ) ORDER BY id ASC
+            """, (user_id, after_id, before_id if before_id is not None else 2**63 - 1, limit))
+            return c.fetchall()
+    except Exception as e:
+        logger.error(f"Error fetching chat rows: {e}")
+        return []
+
+def count_chat_messages(user_id, after_id=0, before_id=None):
+    """Cuántos mensajes hay con after_id < id < before_id."""
+    try:
+        with DBConnection(readonly=True) as c:
+            c.execute("SELECT COUNT(*) FROM chat_history WHERE user_id=? AND id>? AND id<?",
+                      (user_id, after_id, before_id if before_id is not None else 2**63 - 1))
+            return c.fetchone()[0]
+    except Exception as e:
+        logger.error(f"Error counting chat messages: {e}")
+        return 0
+
+def get_chat_summary(user_id):
+    """Retorna (summary, last_message_id). ("", 0) si aún no hay resumen."""
+    try:
+        with DBConnection(readonly=True) as c:
+            c.execute("SELECT summary, last_message_id FROM chat_summaries WHERE user_id=?", (user_id,))
+            row = c.fetchone()
+            return (row[0] or "", row[1] or 0) if row else ("", 0)
+    except Exception as e:
+        logger.error(f"Error fetching chat summary: {e}")
+        return "", 0
+
+def save_chat_summary(user_id, summary, last_message_id):
+    try:
+        with DBConnection() as c:
+            c.execute("""
+                INSERT INTO chat_summaries (user_id, summary, last_message_id, updated_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(user_id) DO UPDATE SET summary=excluded.summary, last_message_id=excluded.last_message_id,
+                    updated_at=CURRENT_TIMESTAMP
+            """, (user_id, summary, last_message_id))
+    except Exception as e:
+        logger.error(f"Error saving chat summary: {e}")
+
+# --- Discord Chat Sessions ---
+def add_discord_chat_turns(session_id, turns, keep=40):
+    """Guarda [(role, content), ...] y deja solo los últimos `keep` turnos de la sesión."""
+    try:
+        with DBConnection() as c:
+            c.executemany("INSERT INTO discord_chat_log (session_id, role, content) VALUES (?, ?, ?)",
+                          [(session_id, role, content) for role, content in turns])
+            c.execute("""
+                DELETE FROM discord_chat_log WHERE session_id=? AND id NOT IN (
+                    SELECT id FROM discord_chat_log WHERE session_id=? ORDER BY id DESC LIMIT ?
+                )
+            """, (session_id, session_id, keep))
+    except Exception as e:
+        logger.error(f"Error saving discord chat turns: {e}")
+
+def get_discord_chat_log(session_id, limit=40):
+    """Retorna los últimos `limit` turnos [(role, content), ...] en orden cronológico."""
+    try:
+        with DBConnection(readonly=True) as c:
+            c.execute("""
+                SELECT role, content FROM (
+                    SELECT id, role, content FROM discord_chat_log
+                    WHERE session_id=? ORDER BY id DESC LIMIT ?
+                ) ORDER BY id ASC
+            """, (session_id, limit))
+            return c.fetchall()
+    except Exception as e:
+        logger.error(f"Error fetching discord chat log: {e}")
+        return []
+
+# --- Persistent Cache System ---
+def load_cache_entries(namespace, limit):
+    """Retorna [(key, value_json, expires_at), ...] de la más antigua a la más reciente."""
+    try:
+        with DBConnection() as c:
+            # Purgar expiradas de paso
+            c.execute("DELETE FROM cache_entries WHERE namespace=? AND expires_at <= ?", (namespace, time.time()))
+            c.execute("""
+                SELECT key, value, expires_at FROM (
+                    SELECT key, value, expires_at, stored_at FROM cache_entries
+                    WHERE namespace=?
+                    ORDER BY stored_at DESC LIMIT ?
+                ) ORDER BY stored_at ASC
+            """, (namespace, limit))
+            return c.fetchall()
+    except Exception as e:
+        logger.error(f"Error loading cache {namespace}: {e}")
+        return []
+
+def save_cache_entry(namespace, key, value_json, expires_at):
+    try:
+        with DBConnection() as c:
+            c.execute("INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at, stored_at) VALUES (?, ?, ?, ?, ?)",
+                      (namespace, key, value_json, expires_at, time.time()))
+    except Exception as e:
+        logger.error(f"Error saving cache entry: {e}")
+
+def delete_cache_entry(namespace, key):
+    try:
+        with DBConnection() as c:
+            c.execute("DELETE FROM cache_entries WHERE namespace=? AND key=?", (namespace, key))
+    except Exception as e:
+        logger.error(f"Error deleting cache entry: {e}")
+
+# --- Track Identity System ---
+def get_track_identity(query_key):
+    """Retorna {'video_id', 'title', 'duration', 'thumbnail'} o None. Suma un hit si existe."""
+    try:
+        with DBConnection() as c:
+            c.execute("SELECT video_id, title, duration, thumbnail FROM track_identity WHERE query_key=?", (query_key,))
+            row = c.fetchone()
+            if not row:
+                return None
+            c.execute("UPDATE track_identity SET hits = hits + 1, last_hit = CURRENT_TIMESTAMP WHERE query_key=?", (query_key,))
+            return {"video_id": row[0], "title": row[1], "duration": row[2], "thumbnail": row[3]}
+    except Exception as e:
+        logger.error(f"Error reading track identity: {e}")
+        return None
+
+def save_track_identity(query_key, video_id, title, duration, thumbnail):
+    try:
+        with DBConnection() as c:
+            # Upsert conservando el contador de hits
+            c.execute("""
+                INSERT INTO track_identity (query_key, video_id, title, duration, thumbnail) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(query_key) DO UPDATE SET video_id=excluded.video_id, title=excluded.title,
+                    duration=excluded.duration, thumbnail=COALESCE(excluded.thumbnail, track_identity.thumbnail)
+            """, (query_key, video_id, title, duration, thumbnail))
+    except Exception as e:
+        logger.error(f"Error saving track identity: {e}")
+
+def delete_track_identity(query_key):
+    try:
+        with DBConnection() as c:
+            c.execute("DELETE FROM track_identity WHERE query_key=?", (query_key,))
+    except Exception as e:
+        logger.error(f"Error deleting track identity: {e}")
+
+def count_track_identities():
+    try:
+        with DBConnection(readonly=True) as c:
+            c.execute("SELECT COUNT(*) FROM track_identity")
+            return c.fetchone()[0]
+    except Exception as e:
+        logger.error(f"Error counting track identities: {e}")
+        return 0
+
+# --- Audio Cache System ---
+def record_audio_play(video_id, title, duration):
+    """Suma una reproducción al video. Retorna (plays, path) tras actualizar, o (0, None) si falla."""
+    try:
+        with DBConnection() as c:
+            c.execute("""
+                INSERT INTO audio_cache (video_id, title, duration, plays, last_played) VALUES (?, ?, ?, 1, ?)
+                ON CONFLICT(video_id) DO UPDATE SET plays = plays + 1, last_played = excluded.last_played,
+                    title = COALESCE(excluded.title, audio_cache.title),
+                    duration = COALESCE(excluded.duration, audio_cache.duration)
+            """, (video_id, title, duration, time.time()))
+            c.execute("SELECT plays, path FROM audio_cache WHERE video_id=?", (video_id,))
+            return c.fetchone()
+    except Exception as e:
+        logger.error(f"Error recording audio play: {e}")
+        return 0, None
+
+def get_cached_audio(video_id):
+    """Retorna {'video_id', 'title', 'duration', 'path', 'size_bytes'} si hay archivo local, o None."""
+    try:
+        with DBConnection(readonly=True) as c:
+            c.execute("SELECT video_id, title, duration, path, size_bytes FROM audio_cache WHERE video_id=? AND path IS NOT NULL", (video_id,))
+            row = c.fetchone()
+            if not row:
+                return None
+            return {"video_id": row[0], "title": row[1], "duration": row[2], "path": row[3], "size_bytes": row[4]}
+    except Exception as e:
+        logger.error(f"Error reading audio cache: {e}")
+        return None
+
+def set_cached_audio(video_id, path, size_bytes):
+    """Marca el video como descargado (path) o como no descargado (path=None)."""
+    try:
+        with DBConnection() as c:
+            c.execute("UPDATE audio_cache SET path=?, size_bytes=?, cached_at=? WHERE video_id=?",
+                      (path, size_bytes if path else 0, time.time() if path else None, video_id))
+    except Exception as e:
+        logger.error(f"Error updating audio cache: {e}")
+
+def get_audio_cache_usage():
+    """Retorna (archivos, bytes) de la cache de audio."""
+    try:
+        with DBConnection(readonly=True) as c:
+            c.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM audio_cache WHERE path IS NOT NULL")
+            return c.fetchone()
+    except Exception as e:
+        logger.error(f"Error reading audio cache usage: {e}")
+        return 0, 0
+
+def get_audio_cache_lru(exclude_id=None, limit=20):
+    """Retorna [(video_id, path, size_bytes), ...] de los archivos menos escuchados recientemente."""
+    try:
+        with DBConnection(readonly=True) as c:
+            c.execute("""
+                SELECT video_id, path, size_bytes FROM audio_cache
+                WHERE path IS NOT NULL AND video_id != ?
+                ORDER BY last_played ASC LIMIT ?
+            """, (exclude_id or "", limit))
+            return c.fetchall()
+    except Exception as e:
+        logger.error(f"Error reading audio cache LRU: {e}")
+        return []
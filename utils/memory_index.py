@@ -0,0 +1,203 @@
+import re
+import math
+import unicodedata
+from collections import OrderedDict, Counter
+import numpy as np
+import config
+from utils import database
+from utils.logger import setup_logger
+
+logger = setup_logger("MemoryIndex")
+
+# Índice BM25 local (sin red) sobre la tabla memory: en vez de pegar todos los datos de !recuerda
+# en el prompt, solo van los top-k relevantes para el mensaje actual.
+
+# Palabras vacías (sin tildes, igual que los tokens). "no"/"nunca" NO: cambian el sentido del dato.
+STOPWORDS = {
+    "a", "al", "algo", "ante", "con", "como", "de", "del", "el", "ella", "ellos", "en", "es", "esa", "ese",
+    "eso", "esta", "este", "esto", "fue", "ha", "hay", "la", "las", "le", "les", "lo", "los", "mas", "me",
+    "mi", "mis", "muy", "o", "para", "pero", "por", "que", "se", "ser", "si", "sin", "su", "sus", "te", "tu",
+    "un", "una", "uno", "unos", "unas", "y", "ya", "yo", "soy", "son", "estoy",
+    "the", "and", "of", "to", "is", "my", "i",
+}
+
+# Un dato y su negación nunca son duplicados, por parecidos que sean en coseno
+NEGATIONS = {"no", "nunca", "jamas", "ni", "tampoco"}
+
+_WORD_RE = re.compile(r"\w+")
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text):
+    """Minúsculas, sin tildes, sin palabras vacías."""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return [w for w in _WORD_RE.findall(text) if w not in STOPWORDS and len(w) > 1]
+
+
+class UserMemoryIndex:
+    """
+    Matriz término-frecuencia (documentos x vocabulario) de los datos de un usuario.
+    add() agrega una fila (y columnas si hay palabras nuevas) sin reconstruir nada.
+    """
+    def __init__(self):
+        self.facts = []            # Texto original, en orden de inserción
+        self.negations = []        # Palabras de negación de cada dato (frozenset)
+        self.vocab = {}            # {término: columna}
+        self.tf = np.zeros((0, 0), dtype=np.float32)
+        self.doc_len = np.zeros(0, dtype=np.float32)
+
+    def _vector(self, tokens, grow=False):
+        """Vector de conteos sobre el vocabulario (grow=True agrega términos nuevos)."""
+        if grow:
+            for token in tokens:
+                if token not in self.vocab:
+                    self.vocab[token] = len(self.vocab)
+        vec = np.zeros(len(self.vocab), dtype=np.float32)
+        for token in tokens:
+            col = self.vocab.get(token)
+            if col is not None:
+                vec[col] += 1
+        return vec
+
+    def find_duplicate(self, fact, threshold):
+        """
+        Retorna el dato ya guardado casi idéntico a `fact` (coseno >= threshold y las mismas
+        negaciones) o None.
+        """
+        tokens = tokenize(fact)
+        if not self.facts:
+            return None
+        if not tokens:
+            normalized = (fact or "").strip().lower()
+            return next((f for f in self.facts if f.strip().lower() == normalized), None)
+
+        vec = self._vector(tokens)
+        # La norma incluye las palabras que aún no están en el vocabulario
+        norm = math.sqrt(sum(c * c for c in Counter(tokens).values()))
+
+        norms = np.linalg.norm(self.tf, axis=1)
+        norms[norms == 0] = 1
+        sims = (self.tf @ vec) / (norms * norm)
+        negations = frozenset(tokens) & NEGATIONS
+        for i in np.argsort(sims)[::-1]:
+            if sims[i] < threshold:
+                break
+            if self.negations[i] == negations:
+                return self.facts[i]
+        return None
+
+    def add(self, fact):
+        tokens = tokenize(fact)
+        vec = self._vector(tokens, grow=True)
+        if self.tf.shape[1] < len(self.vocab):
+            self.tf = np.pad(self.tf, ((0, 0), (0, len(self.vocab) - self.tf.shape[1])))
+        self.tf = np.vstack([self.tf, vec])
+        self.doc_len = np.append(self.doc_len, np.float32(len(tokens)))
+        self.facts.append(fact)
+        self.negations.append(frozenset(tokens) & NEGATIONS)
+
+    def top_k(self, query, k):
+        """
+        Los k datos más relevantes para `query` (BM25), en el orden original.
+        Si pocos coinciden (o no hay query) se completa con los más recientes.
+        """
+        n = len(self.facts)
+        if n <= k:
+            return list(self.facts)
+
+        scores = np.zeros(n, dtype=np.float32)
+        cols = sorted({self.vocab[t] for t in tokenize(query) if t in self.vocab})
+        if cols:
+            tf = self.tf[:, cols]
+            df = (tf > 0).sum(axis=0)
+            idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+            avgdl = self.doc_len.mean() or 1.0
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len / avgdl)
+            scores = ((tf * (BM25_K1 + 1)) / (tf + norm[:, None]) * idf).sum(axis=1)
+
+        # Desempate por recencia: entre iguales (ej: todos 0) ganan los últimos datos
+        order = np.lexsort((np.arange(n), scores))[::-1][:k]
+        return [self.facts[i] for i in sorted(order)]
+
+
+class MemoryIndex:
+    """Índices por usuario, construidos desde la DB la primera vez y con LRU de `max_users`."""
+    def __init__(self, max_users=500, dedup_threshold=0.9):
+        self.max_users = max_users
+        self.dedup_threshold = dedup_threshold
+        self._users = OrderedDict() # {user_id: UserMemoryIndex}
+
+        # Contadores
+        self.builds = 0
+        self.queries = 0
+        self.duplicates = 0
+        self.facts_total = 0
+        self.facts_sent = 0
+
+    def _get(self, user_id):
+        index = self._users.get(user_id)
+        if index is not None:
+            self._users.move_to_end(user_id)
+            return index
+
+        index = UserMemoryIndex()
+        for fact in database.get_memory(user_id):
+            # Duplicados que ya estaban en la DB (de antes del dedup) no se indexan dos veces
+            if index.find_duplicate(fact, self.dedup_threshold) is None:
+                index.add(fact)
+        self.builds += 1
+
+        self._users[user_id] = index
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        return index
+
+    def remember(self, user_id, fact):
+        """Guarda el dato si no es casi igual a uno existente. Retorna (guardado, dato_existente)."""
+        index = self._get(user_id)
+        duplicate = index.find_duplicate(fact, self.dedup_threshold)
+        if duplicate is not None:
+            self.duplicates += 1
+            return False, duplicate
+
+        database.add_memory(user_id, fact)
+        index.add(fact) # Incremental: sin releer la tabla
+        return True, None
+
+    def relevant(self, user_id, query=None, k=None):
+        """Los datos del usuario más relevantes para `query` (máx k, por defecto MEMORY_TOP_K)."""
+        index = self._get(user_id)
+        facts = index.top_k(query or "", k or config.MEMORY_TOP_K)
+        self.queries += 1
+        self.facts_total += len(index.facts)
+        self.facts_sent += len(facts)
+        return facts
+
+    def stats(self):
+        return {
+            'users': len(self._users),
+            'builds': self.builds,
+            'queries': self.queries,
+            'duplicates': self.duplicates,
+            'avg_facts_stored': round(self.facts_total / self.queries, 1) if self.queries else 0,
+            'avg_facts_sent': round(self.facts_sent / self.queries, 1) if self.queries else 0
+        }
+
+
+_index = None
+
+def get_memory_index():
+    """Instancia compartida (una por proceso)."""
+    global _index
+    if _index is None:
+        _index = MemoryIndex(dedup_threshold=config.MEMORY_DEDUP_THRESHOLD)
+    return _index
+
+def remember(user_id, fact):
+    return get_memory_index().remember(user_id, fact)
+
+def relevant(user_id, query=None, k=None):
+    return get_memory_index().relevant(user_id, query, k)
@@ -1,17 +1,45 @@
-import yt_dlp
-import os
 import config
 from utils.logger import setup_logger
+from utils import database
 import asyncio
 import json
-import google.generativeai as genai
-import edge_tts
-import uuid
 import re
+import time
+from urllib.parse import urlparse, parse_qs
+from utils.cache import TTLCache, SingleFlight, normalize_query
+from utils.ytdl_pool import create_extractor
+from utils.audio_cache import AudioCache
+from utils import tts
+from utils import ai_client
 
 
 logger = setup_logger("MusicCore")
 
+_VIDEO_ID_RE = re.compile(r"(?:v=|youtu\.be/|/shorts/|/embed/|/live/)([A-Za-z0-9_-]{11})")
+_EXPIRE_PATH_RE = re.compile(r"/expire/(\d+)")
+
+def extract_video_id(url):
+    """Extrae el ID de 11 caracteres de una URL de YouTube. None si no es de YouTube."""
+    if not url:
+        return None
+    match = _VIDEO_ID_RE.search(url)
+    return match.group(1) if match else None
+
+def parse_stream_expiry(stream_url):
+    """Lee el timestamp 'expire' de una URL de googlevideo. None si no lo trae."""
+    if not stream_url:
+        return None
+    try:
+        params = parse_qs(urlparse(stream_url).query)
+        if 'expire' in params:
+            return int(params['expire'][0])
+        match = _EXPIRE_PATH_RE.search(stream_url)
+        if match:
+            return int(match.group(1))
+    except (ValueError, IndexError):
+        pass
+    return None
+
 class MusicCore:
     def __init__(self):
         # Configurar YTDL
@@ -22,7 +50,6 @@ class MusicCore:
 
         self.ytdl_opts = config.YTDL_FORMAT_OPTIONS.copy()
         self.ytdl_opts['logger'] = YTDLLogger()
-        self.ytdl = yt_dlp.YoutubeDL(self.ytdl_opts)
         
         # Spotify Config
         self.sp = None
@@ -38,20 +65,59 @@ class MusicCore:
                 logger.error(f"Error initializing Spotify: {e}")
 
         # Optimizacion: Buscador Rapido (Flat)
-        self.search_cache = {}
         search_opts = self.ytdl_opts.copy()
         search_opts['extract_flat'] = True # No descargar info detallada de video
-        self.search_ytdl = yt_dlp.YoutubeDL(search_opts)
+
+        # Extracción: pools de YoutubeDL ('full' = stream, 'flat' = búsqueda) sobre un executor
+        # dedicado y acotado. Backend 'thread' (hilos) o 'process' (procesos, fuera del GIL).
+        self.extractor = create_extractor(
+            config.EXTRACT_BACKEND,
+            {'full': self.ytdl_opts, 'flat': search_opts},
+            workers=config.EXTRACT_WORKERS,
+            instances=config.EXTRACT_INSTANCES,
+            max_pending=config.EXTRACT_MAX_PENDING,
+            queue_timeout=config.EXTRACT_QUEUE_TIMEOUT
+        )
+        logger.info(f"Extractor yt-dlp: backend={config.EXTRACT_BACKEND}, workers={config.EXTRACT_WORKERS}")
+
+        # Cache LRU + TTL, persistida en SQLite para no arrancar en frío tras un reinicio
+        self.search_cache = TTLCache(
+            max_entries=config.SEARCH_CACHE_SIZE,
+            ttl=config.SEARCH_CACHE_TTL,
+            namespace="search" if config.CACHE_PERSIST else None
+        )
+
+        # Cache de Streams: {id:<video_id> | q:<query>} -> datos resueltos
+        # El TTL de cada entrada sale del 'expire=' de la URL (menos un margen), no se persiste.
+        self.stream_cache = TTLCache(
+            max_entries=config.STREAM_CACHE_SIZE,
+            ttl=config.STREAM_CACHE_DEFAULT_TTL
+        )
+
+        # Deduplicación de extracciones concurrentes idénticas (bot + web a la vez)
+        self.inflight = SingleFlight()
+
+        # Índice persistente "Artista - Canción" -> video (tabla track_identity)
+        self.identity_hits = 0
+        self.identity_misses = 0
+
+        # Cache de audio en disco (opt-in): las canciones más repetidas suenan desde archivo local
+        self.audio_cache = AudioCache(
+            config.AUDIO_CACHE_DIR,
+            config.AUDIO_CACHE_MAX_BYTES,
+            min_plays=config.AUDIO_CACHE_MIN_PLAYS,
+            max_duration=config.AUDIO_CACHE_MAX_DURATION,
+            enabled=config.AUDIO_CACHE_ENABLED
+        )
 
     async def extract_playlist_info(self, url):
         """
-        Extracts playlist videos efficiently using search_ytdl (flat extraction).
-        Returns a list of dicts: {'title': str, 'url': str (original_url), 'is_intro': False}
+        Extracts playlist videos efficiently using the 'flat' extractor pool.
+        Returns a list of dicts: {'id': str|None, 'title': str, 'url': str (original_url), 'is_intro': False}
         """
         try:
-            loop = asyncio.get_event_loop()
-            # extract_flat is already set in search_ytdl options
-            info = await loop.run_in_executor(None, lambda: self.search_ytdl.extract_info(url, download=False))
+            # extract_flat is already set in the 'flat' pool options
+            info = await self.extractor.extract('flat', url)
             
             if 'entries' not in info:
                 return []
@@ -70,6 +136,7 @@ class MusicCore:
                 
                 if video_url:
                     songs.append({
+                        'id': entry.get('id') or extract_video_id(video_url),
                         'title': title,
                         'url': video_url,
                         'is_intro': False
@@ -79,6 +146,57 @@ class MusicCore:
             logger.error(f"Error extracting playlist: {e}")
             return []
 
+    def _spotify_result(self, track, query, thumbnail=None):
+        """Convierte un track de Spotify en un resultado 'Pending Search' (se busca en YouTube al reproducir)."""
+        if not thumbnail and track.get('album') and track['album'].get('images'):
+            thumbnail = track['album']['images'][0]['url']
+        return {
+            'type': 'query',
+            'title': f"{track['artists'][0]['name']} - {track['name']}",
+            'url': query,
+            'duration': int(track.get('duration_ms', 0) / 1000),
+            'source': 'spotify_query',
+            'thumbnail': thumbnail
+        }
+
+    async def iter_spotify_tracks(self, query):
+        """
+        Generador async de páginas de resultados de Spotify (track, playlist, álbum o top del artista).
+        Las llamadas a la API van al executor para no bloquear el loop; Spotify pagina de 100 en 100,
+        así que el que consume puede empezar a reproducir con la primera página.
+        """
+        loop = asyncio.get_event_loop()
+
+        def valid(track):
+            return track and track.get('type', 'track') == 'track' and track.get('artists')
+
+        if '/playlist/' in query:
+            page = await loop.run_in_executor(None, lambda: self.sp.playlist_items(query, additional_types=('track',)))
+            while page:
+                yield [self._spotify_result(item['track'], query) for item in page['items'] if valid(item.get('track'))]
+                if not page.get('next'):
+                    break
+                page = await loop.run_in_executor(None, self.sp.next, page)
+
+        elif '/album/' in query:
+            album = await loop.run_in_executor(None, self.sp.album, query)
+            thumbnail = album['images'][0]['url'] if album.get('images') else None
+            page = album['tracks']
+            while page:
+                # Los tracks de un álbum no traen 'album': usamos la portada del álbum
+                yield [self._spotify_result(t, query, thumbnail) for t in page['items'] if valid(t)]
+                if not page.get('next'):
+                    break
+                page = await loop.run_in_executor(None, self.sp.next, page)
+
+        elif '/artist/' in query:
+            top = await loop.run_in_executor(None, self.sp.artist_top_tracks, query)
+            yield [self._spotify_result(t, query) for t in top['tracks'] if valid(t)]
+
+        elif '/track/' in query:
+            track = await loop.run_in_executor(None, self.sp.track, query)
+            yield [self._spotify_result(track, query)]
+
     async def search(self, query, limit=None):
         """
         Busca canciones en YouTube o Spotify.
@@ -86,42 +204,47 @@ class MusicCore:
         """
         results = []
         
-        # 1. Spotify Handling (Sin cambios)
+        # 1. Spotify Handling (todas las páginas; para ir encolando por partes usar iter_spotify_tracks)
         if 'open.spotify.com' in query and self.sp:
             try:
-                track_names = []
-                if 'track' in query:
-                    track = self.sp.track(query)
-                    track_names.append(f"{track['artists'][0]['name']} - {track['name']}")
-                elif 'playlist' in query:
-                    items = self.sp.playlist_tracks(query)
-                    for item in items['items']:
-                        track = item['track']
-                        track_names.append(f"{track['artists'][0]['name']} - {track['name']}")
-                
-                # Convertir a objetos "Pending Search"
-                for name in track_names:
-                    results.append({
-                        'type': 'query',
-                        'title': name, 
-                        'url': query,
-                        'duration': 0,
-                        'source': 'spotify_query',
-                        'thumbnail': track['album']['images'][0]['url'] if track['album']['images'] else None
-                    })
+                async for page in self.iter_spotify_tracks(query):
+                    results.extend(page)
                 return results
             except Exception as e:
                 logger.error(f"Spotify Search Error: {e}")
                 raise e
 
         # 2. YouTube Search
-        if query in self.search_cache:
+        # La clave incluye el límite: no es lo mismo 1 resultado (bot) que 5 (web)
+        cache_key = f"{limit or 1}:{normalize_query(query)}"
+        cached = self.search_cache.get(cache_key)
+        if cached is not None:
             # logger.info(f"Cache Hit: {query}")
-            return self.search_cache[query]
+            return cached
+
+        # Un solo resultado de texto: si ya sabemos qué video es, no hace falta buscar
+        if not query.startswith("http") and (limit or 1) == 1:
+            identity = self._lookup_identity(normalize_query(query))
+            if identity:
+                video_url = f"https://www.youtube.com/watch?v={identity['video_id']}"
+                return [{
+                    'type': 'video',
+                    'id': identity['video_id'],
+                    'title': identity['title'] or query,
+                    'url': video_url,
+                    'webpage_url': video_url,
+                    'duration': identity['duration'] or 0,
+                    'source': 'youtube',
+                    'thumbnail': identity['thumbnail']
+                }]
+
+        # Single-flight: si ya hay una extracción igual en curso, esperamos esa
+        return await self.inflight.do(f"search:{cache_key}", lambda: self._youtube_search(query, limit, cache_key))
 
+    async def _youtube_search(self, query, limit, cache_key):
+        """Búsqueda flat en YouTube (sin cache). Guarda el resultado en search_cache."""
+        results = []
         try:
-            loop = asyncio.get_event_loop()
-            
             # Apply limit if text search
             search_query = query
             if not query.startswith("http"):
@@ -129,8 +252,8 @@ class MusicCore:
                  lim = limit if limit else 1
                  search_query = f"ytsearch{lim}:{query}"
             
-            # Usar buscador rapido (search_ytdl)
-            data = await loop.run_in_executor(None, lambda: self.search_ytdl.extract_info(search_query, download=False))
+            # Usar buscador rapido (pool 'flat')
+            data = await self.extractor.extract('flat', search_query)
             
             if not data:
                 return []
@@ -149,6 +272,7 @@ class MusicCore:
                      
                      new_results.append({
                         'type': 'video',
+                        'id': entry.get('id') or extract_video_id(video_url),
                         'title': entry.get('title', 'Unknown'),
                         'url': video_url, 
                         'webpage_url': video_url,
@@ -164,6 +288,7 @@ class MusicCore:
 
                  new_results.append({
                     'type': 'video',
+                    'id': data.get('id') or extract_video_id(video_url),
                     'title': data.get('title', 'Unknown'),
                     'url': video_url,
                     'webpage_url': video_url,
@@ -172,9 +297,13 @@ class MusicCore:
                     'thumbnail': data.get('thumbnail')
                 })
             
-            # Guardar en Cache
+            # Guardar en Cache (no cacheamos búsquedas vacías)
             results.extend(new_results)
-            self.search_cache[query] = results
+            if results:
+                self.search_cache.set(cache_key, results)
+                # El primer resultado de un texto es su identidad (query -> video)
+                if not query.startswith("http"):
+                    self._remember_identity(normalize_query(query), results[0])
                 
         except Exception as e:
             logger.error(f"YouTube Search Error: {e}")
@@ -182,55 +311,188 @@ class MusicCore:
             
         return results
 
-    async def get_stream_url(self, query):
+    async def get_stream_url(self, query, video_id=None):
         """
         Resuelve una query (ej: 'Daft Punk One More Time') a una URL de audio directo.
         Útil para resolver las búsquedas de Spotify o inputs de texto.
+        video_id: str|None - Si se conoce el ID (o query es una URL), se va directo al video sin buscar.
+        Los resultados se cachean por video id y por query hasta poco antes de que expire la URL.
+        Para texto se consulta antes el índice track_identity (query -> video) para saltarse el ytsearch.
         """
+        identity_key = None
+        if video_id:
+            query = f"https://www.youtube.com/watch?v={video_id}"
+        elif query.startswith("http"):
+            video_id = extract_video_id(query)
+        else:
+            identity_key = normalize_query(query)
+        cache_key = f"id:{video_id}" if video_id else f"q:{identity_key or normalize_query(query)}"
+
+        cached = self.stream_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        identity = self._lookup_identity(identity_key) if identity_key else None
+        if identity:
+            cached = self.stream_cache.get(f"id:{identity['video_id']}")
+            if cached is not None:
+                return cached
+
+        return await self.inflight.do(f"stream:{cache_key}", lambda: self._resolve_stream(query, cache_key, identity_key, identity))
+
+    async def _resolve_stream(self, query, cache_key, identity_key=None, identity=None):
+        """Extracción completa con yt-dlp (sin cache). Guarda el resultado en stream_cache."""
         try:
-            loop = asyncio.get_event_loop()
-            # force search if it's not a URL
-            if not query.startswith("http"):
-                query = f"ytsearch1:{query}"
-                
-            data = await loop.run_in_executor(None, lambda: self.ytdl.extract_info(query, download=False))
-            
-            if not data:
-                return None
+            result = None
+            if identity:
+                # Ir directo al video conocido; si ya no existe, olvidar y buscar de nuevo
+                result = await self._extract_stream(f"https://www.youtube.com/watch?v={identity['video_id']}")
+                if not result:
+                    database.delete_track_identity(identity_key)
 
-            if 'entries' in data:
-                if not data['entries']: # Empty list check
-                    return None
-                data = data['entries'][0]
-                
-            return {
-                'title': data.get('title'),
-                'url': data.get('url'), # Direct Stream URL
-                'duration': data.get('duration', 0),
-                'webpage_url': data.get('webpage_url'),
-                'thumbnail': data.get('thumbnail')
-            }
+            if not result:
+                # force search if it's not a URL
+                search_query = query if query.startswith("http") else f"ytsearch1:{query}"
+                result = await self._extract_stream(search_query)
+                if result and identity_key:
+                    self._remember_identity(identity_key, result)
+
+            if result:
+                self._cache_stream(cache_key, result.get('id'), result)
+            return result
         except Exception as e:
             logger.error(f"Stream Resolution Error: {e}")
             return None
 
-    async def generate_radio_content(self, recent_history, older_history, is_start=False):
+    async def _extract_stream(self, target):
+        """Extrae un único video (URL o ytsearch1:) y lo reduce al formato de get_stream_url."""
+        data = await self.extractor.extract('full', target)
+        
+        if not data:
+            return None
+
+        if 'entries' in data:
+            if not data['entries']: # Empty list check
+                return None
+            data = data['entries'][0]
+            
+        return {
+            'id': data.get('id'),
+            'title': data.get('title'),
+            'url': data.get('url'), # Direct Stream URL
+            'duration': data.get('duration', 0),
+            'webpage_url': data.get('webpage_url'),
+            'thumbnail': data.get('thumbnail'),
+            'acodec': data.get('acodec') # 'opus' permite passthrough sin re-codificar
+        }
+
+    def _lookup_identity(self, identity_key):
+        """Consulta track_identity (query normalizada -> video) con contadores de hits."""
+        identity = database.get_track_identity(identity_key)
+        if identity:
+            self.identity_hits += 1
+        else:
+            self.identity_misses += 1
+        return identity
+
+    def _remember_identity(self, identity_key, result):
+        """Guarda query -> video tras una búsqueda exitosa."""
+        video_id = result.get('id') or extract_video_id(result.get('webpage_url') or result.get('url'))
+        if video_id:
+            database.save_track_identity(identity_key, video_id, result.get('title'), result.get('duration') or 0, result.get('thumbnail'))
+
+    def _cache_stream(self, cache_key, video_id, result):
+        """Guarda un stream resuelto bajo su query y su video id, respetando el 'expire' de la URL."""
+        if not result.get('url'):
+            return
+
+        ttl = config.STREAM_CACHE_DEFAULT_TTL
+        expire = parse_stream_expiry(result['url'])
+        if expire:
+            # Refrescar antes de tiempo: una canción larga tiene que poder terminar
+            ttl = expire - time.time() - config.STREAM_CACHE_REFRESH_MARGIN
+        if ttl <= 0:
+            return
+
+        self.stream_cache.set(cache_key, result, ttl=ttl)
+        if video_id and cache_key != f"id:{video_id}":
+            self.stream_cache.set(f"id:{video_id}", result, ttl=ttl)
+
+    def local_audio(self, query, video_id=None):
+        """
+        Retorna la entrada de audio_cache (archivo local) para una query/URL/video, o None.
+        Solo consulta SQLite (id directo, ID de la URL o índice track_identity): nunca la red.
+        """
+        if not self.audio_cache.enabled:
+            return None
+        if not video_id:
+            if query.startswith("http"):
+                video_id = extract_video_id(query)
+            else:
+                identity = database.get_track_identity(normalize_query(query))
+                video_id = identity['video_id'] if identity else None
+        return self.audio_cache.lookup(video_id)
+
+    def cache_stats(self):
+        """Contadores de las caches de MusicCore."""
+        stats = {
+            'search': self.search_cache.stats(),
+            'stream': self.stream_cache.stats(),
+            'inflight': self.inflight.stats(),
+            'identity': self.identity_stats(),
+            'tts': tts.get_tts_cache().stats()
+        }
+        if self.audio_cache.enabled:
+            stats['audio'] = self.audio_cache.stats()
+        return stats
+
+    def identity_stats(self):
+        """Contadores del índice track_identity (mismo formato que TTLCache.stats())."""
+        total = self.identity_hits + self.identity_misses
+        return {
+            'size': database.count_track_identities(),
+            'hits': self.identity_hits,
+            'misses': self.identity_misses,
+            'hit_rate': round(self.identity_hits / total, 3) if total else 0.0
+        }
+
+    async def generate_radio_content(self, recent_history, older_history, is_start=False, mood=None, enable_intros=True, synthesize_intro=True):
         """
         Genera la siguiente canción y una intro usando Gemini + EdgeTTS.
+        mood: str|None - Si se especifica (ej: "Rock", "Lofi"), fuerza ese estilo.
+        enable_intros: bool - Si es False, no genera intro (audio/texto vacío).
+        synthesize_intro: bool - Si es False, solo devuelve el texto (el audio se hará en streaming después).
         Retorna:
         {
-            'song_query': str,      # Lo que se buscará en YouTube
-            'intro_text': str,      # Texto de la intro
+            'song_query': str,       # Lo que se buscará en YouTube
+            'intro_text': str,       # Texto de la intro
             'intro_audio': str|None, # Ruta al archivo MP3 generado
-            'song_data': dict|None   # Datos resueltos de la canción (Stream URL)
+            'song_data': dict|None,  # Datos resueltos de la canción (Stream URL)
+            'timings': dict          # ms por etapa (gemini, tts, resolve, total)
         }
         """
-    async def generate_radio_content(self, recent_history, older_history, is_start=False, mood=None, enable_intros=True):
+        batch = await self.generate_radio_batch(recent_history, older_history, 1, is_start, mood, enable_intros, synthesize_intro)
+        return batch[0]
+
+    async def generate_radio_batch(self, recent_history, older_history, count, is_start=False, mood=None, enable_intros=True, synthesize_intro=True):
         """
-        Genera la siguiente canción y una intro usando Gemini + EdgeTTS.
-        mood: str|None - Si se especifica (ej: "Rock", "Lofi"), fuerza ese estilo.
-        enable_intros: bool - Si es False, no genera intro (audio/texto vacío).
+        Pide a Gemini `count` canciones en una sola llamada (lista JSON) y las prepara todas en paralelo.
+        Retorna una lista (en el orden sugerido) de dicts con el formato de generate_radio_content.
         """
+        prompt = self._build_radio_prompt(recent_history, older_history, count, is_start, mood)
+
+        # 2. Consultar a Gemini
+        gemini_start = time.perf_counter()
+        picks = await self._ask_radio_picks(prompt, count)
+        gemini_ms = int((time.perf_counter() - gemini_start) * 1000)
+
+        # 3. Cada canción: TTS + resolución en paralelo (y todas las canciones a la vez)
+        return await asyncio.gather(*(
+            self._prepare_radio_pick(song_name, intro, enable_intros, gemini_ms, synthesize_intro)
+            for song_name, intro in picks
+        ))
+
+    def _build_radio_prompt(self, recent_history, older_history, count, is_start, mood):
         import random 
 
         # 1. Preparar Prompt
@@ -288,62 +550,99 @@ class MusicCore:
             f"CONTEXTO TEMPORAL: {time_context}. "
             "COMENTARIO OBLIGATORIO: Di un dato curioso real o tu opinión personal (estilo Tsundere) sobre la canción que elijas. Demuestra que sabes de música. "
             "Genera una intro corta (máx 25 palabras). "
-            "Responde con un JSON válido: {\"song\": \"Artista - Canción\", \"intro\": \"Frase en español\"}"
         )
+        if count == 1:
+            prompt += "Responde con un JSON válido: {\"song\": \"Artista - Canción\", \"intro\": \"Frase en español\"}"
+        else:
+            prompt += (
+                f"Elige {count} canciones DISTINTAS, en orden de reproducción, que fluyan bien entre sí (cada una con su intro). "
+                "Responde con un JSON válido: [{\"song\": \"Artista - Canción\", \"intro\": \"Frase en español\"}, ...]"
+            )
         
-        # 2. Consultar a Gemini
-        song_name = "Daft Punk - One More Time"
-        intro = "Aquí tienes música."
+        return prompt
+
+    async def _ask_radio_picks(self, prompt, count):
+        """Consulta a Gemini y parsea [(song, intro), ...] (máx `count`). Si falla, una canción por defecto."""
+        default = [("Daft Punk - One More Time", "Aquí tienes música.")]
         
         try:
-            genai.configure(api_key=config.GEMINI_KEY)
-            model = genai.GenerativeModel(config.AI_MODEL) 
-            resp = await model.generate_content_async(prompt)
+            resp = await ai_client.generate(prompt, priority=ai_client.PRIORITY_BACKGROUND)
             text_full = resp.text.strip()
             
-            # Parseo
-            json_match = re.search(r"\{.*\}", text_full, re.DOTALL)
-            if json_match:
-                data = json.loads(json_match.group(0))
-                song_name = data.get("song", song_name)
-                intro = data.get("intro", intro)
+            # Parseo: lista de objetos (lote) u objeto suelto
+            patterns = [r"\[.*\]", r"\{.*\}"] if count > 1 else [r"\{.*\}"]
+            json_match = next((m for m in (re.search(p, text_full, re.DOTALL) for p in patterns) if m), None)
+            if not json_match:
+                return default
+            data = json.loads(json_match.group(0))
+            if isinstance(data, dict):
+                data = [data]
+
+            picks = []
+            seen = set()
+            for entry in data:
+                if not isinstance(entry, dict) or not entry.get("song"):
+                    continue
+                key = normalize_query(entry["song"])
+                if key in seen:
+                    continue
+                seen.add(key)
+                picks.append((entry["song"], entry.get("intro") or default[0][1]))
+            return picks[:count] or default
         except Exception as e:
             logger.error(f"Gemini Error: {e}")
+            return default
+
+    async def _prepare_radio_pick(self, song_name, intro, enable_intros, gemini_ms=0, synthesize_intro=True):
+        """Pipeline de una canción de radio: TTS de la intro y resolución del stream a la vez."""
+        timings = {'gemini_ms': gemini_ms}
+        pipeline_start = time.perf_counter()
             
-        # 3. Generar Audio TTS
-        intro_audio_path = None
-        
-        if enable_intros and config.ANNOUNCER_MODE == "FULL":
-            try:
-                intro_audio_path = f"temp/radio_intro_{uuid.uuid4().hex}.mp3"
-                communicate = edge_tts.Communicate(intro, config.TTS_VOICE, rate=config.TTS_RATE, pitch=config.TTS_PITCH)
-                await communicate.save(intro_audio_path)
-            except Exception as e:
-                logger.error(f"TTS Error: {e}")
-                intro_audio_path = None # Safe fallback
-        else:
-            # If intros disabled, clear intro text too so frontend doesn't show "Asuka AI" metadata for missing clip?
-            # Actually, `intro_audio` being None is enough for frontend to skip playback.
-            # But the user might want to still see the text? Or skip entirely?
-            # User said "deshabilitar a los comentarios... escuchar el bot antes".
-            # So skipping audio is the key.
-            pass
+        # TTS y resolución de la canción en paralelo (no dependen la una de la otra)
+        tts_task = None
+        if enable_intros and synthesize_intro and config.ANNOUNCER_MODE == "FULL":
+            tts_task = asyncio.create_task(self._radio_intro_tts(intro, timings))
         
-        # 4. Resolver Canción
         song_data = await self.get_stream_url(song_name)
+        timings['resolve_ms'] = int((time.perf_counter() - pipeline_start) * 1000)
         
-        # Logic Fix: If song failed (None), DISCARD the intro too. 
-        # Prevents "Intro -> Intro -> Intro" chains when songs fail.
-        if not song_data:
-            if intro_audio_path and os.path.exists(intro_audio_path):
+        # Recoger la intro
+        intro_audio_path = None
+        if tts_task:
+            if song_data:
+                intro_audio_path = await tts_task
+            else:
+                # Sin canción no hay intro: evita cadenas "Intro -> Intro -> Intro" cuando fallan las canciones
+                # (si el TTS ya había terminado, el MP3 se queda en la cache de TTS para la próxima)
+                tts_task.cancel()
                 try:
-                    os.remove(intro_audio_path)
-                except: pass
-            intro_audio_path = None
+                    await tts_task
+                except asyncio.CancelledError:
+                    pass
+
+        timings['total_ms'] = gemini_ms + int((time.perf_counter() - pipeline_start) * 1000)
+        logger.info(
+            f"📻 Radio pipeline: gemini={timings['gemini_ms']}ms tts={timings.get('tts_ms', '-')}ms "
+            f"resolve={timings['resolve_ms']}ms total={timings['total_ms']}ms ({song_name})"
+        )
 
         return {
             'song_query': song_name,
             'intro_text': intro if enable_intros else "", # Hide text if disabled
             'intro_audio': intro_audio_path,
-            'song_data': song_data
+            'song_data': song_data,
+            'timings': timings
         }
+
+    async def _radio_intro_tts(self, intro, timings):
+        """Genera (o saca de la cache de TTS) el MP3 de la intro. Retorna la ruta o None."""
+        start = time.perf_counter()
+        try:
+            return await tts.synthesize(intro)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"TTS Error: {e}")
+            return None # Safe fallback
+        finally:
+            timings['tts_ms'] = int((time.perf_counter() - start) * 1000)
@@ -0,0 +1,203 @@
+import os
+import uuid
+import hashlib
+import asyncio
+import queue
+import edge_tts
+import config
+from utils.logger import setup_logger
+
+logger = setup_logger("TTS")
+
+
+def tts_key(text, voice, rate, pitch):
+    """Clave de contenido: el mismo texto con la misma voz/rate/pitch produce el mismo MP3."""
+    raw = "\x1f".join((voice, rate, pitch, text))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """
+    Cache de audios de EdgeTTS direccionada por contenido: <directory>/<sha256>.mp3.
+    - Cada síntesis escribe a un archivo único (.part) y lo renombra de forma atómica:
+      dos servidores hablando a la vez nunca se pisan el audio.
+    - LRU por mtime (un hit hace 'touch'); al superar max_bytes se borran los más viejos.
+    """
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Contadores
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Restos de síntesis interrumpidas (ej: reinicio a mitad)
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".part"):
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
+
+    def path_for(self, text, voice=None, rate=None, pitch=None):
+        voice, rate, pitch = voice or config.TTS_VOICE, rate or config.TTS_RATE, pitch or config.TTS_PITCH
+        return os.path.join(self.directory, f"{tts_key(text, voice, rate, pitch)}.mp3")
+
+    async def synthesize(self, text, voice=None, rate=None, pitch=None):
+        """Retorna la ruta de un MP3 con `text` hablado. Lanza la excepción de edge_tts si falla."""
+        voice, rate, pitch = voice or config.TTS_VOICE, rate or config.TTS_RATE, pitch or config.TTS_PITCH
+        path = self.path_for(text, voice, rate, pitch)
+
+        if os.path.exists(path):
+            self.hits += 1
+            try:
+                os.utime(path) # Marcar como usado recientemente (LRU)
+            except OSError:
+                pass
+            return path
+
+        self.misses += 1
+        part_path = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            communicate = edge_tts.Communicate(text, voice, rate=rate, pitch=pitch)
+            await communicate.save(part_path)
+            os.replace(part_path, path) # Atómico: nadie lee un MP3 a medias
+        except BaseException:
+            # Error o cancelación: no dejar basura
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+
+        self._enforce_quota()
+        return path
+
+    async def stream(self, text, voice=None, rate=None, pitch=None, chunk_size=16384):
+        """
+        Generador async de bytes MP3 a medida que EdgeTTS los produce (Communicate.stream()).
+        De paso guarda el audio en la cache; si ya estaba, lo lee del disco.
+        """
+        voice, rate, pitch = voice or config.TTS_VOICE, rate or config.TTS_RATE, pitch or config.TTS_PITCH
+        path = self.path_for(text, voice, rate, pitch)
+
+        if os.path.exists(path):
+            self.hits += 1
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            with open(path, "rb") as f:
+                while True:
+                    data = f.read(chunk_size)
+                    if not data:
+                        return
+                    yield data
+
+        self.misses += 1
+        part_path = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            with open(part_path, "wb") as f:
+                communicate = edge_tts.Communicate(text, voice, rate=rate, pitch=pitch)
+                async for chunk in communicate.stream():
+                    if chunk["type"] == "audio":
+                        f.write(chunk["data"])
+                        yield chunk["data"]
+            os.replace(part_path, path)
+        except BaseException:
+            # Error, cancelación o cliente desconectado a mitad: el archivo parcial no vale
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+
+        self._enforce_quota()
+
+    def _enforce_quota(self):
+        """Borra los MP3 menos usados hasta quedar bajo max_bytes."""
+        entries = []
+        total = 0
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".mp3"):
+                continue
+            filepath = os.path.join(self.directory, filename)
+            try:
+                st = os.stat(filepath)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, filepath))
+            total += st.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        # Dejar margen (90%) para no barrer el directorio en cada síntesis
+        target = self.max_bytes * 0.9
+        for _, size, filepath in sorted(entries):
+            try:
+                os.remove(filepath)
+                self.evictions += 1
+                total -= size
+            except OSError:
+                pass
+            if total <= target:
+                break
+
+    def stats(self):
+        """Contadores en el mismo formato que TTLCache.stats()."""
+        files = [f for f in os.listdir(self.directory) if f.endswith(".mp3")]
+        total = self.hits + self.misses
+        return {
+            'size': len(files),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0
+        }
+
+
+class TTSPipe:
+    """
+    Objeto tipo archivo para FFmpegPCMAudio(pipe, pipe=True): el hilo escritor de discord.py llama a
+    read() (bloqueante) mientras una tarea del loop le va pasando los chunks de stream().
+    La reproducción empieza con el primer chunk, no cuando el MP3 está completo.
+    """
+    def __init__(self, text, voice=None, rate=None, pitch=None):
+        self._chunks = queue.Queue()
+        self._eof = False
+        self._task = asyncio.create_task(self._pump(text, voice, rate, pitch))
+
+    async def _pump(self, text, voice, rate, pitch):
+        try:
+            async for data in stream(text, voice, rate, pitch):
+                self._chunks.put(data)
+        except Exception as e:
+            logger.error(f"TTS stream error: {e}")
+        finally:
+            self._chunks.put(None) # EOF -> FFmpeg cierra stdin
+
+    def read(self, size=-1):
+        if self._eof:
+            return b""
+        data = self._chunks.get()
+        if data is None:
+            self._eof = True
+            return b""
+        return data
+
+
+_cache = None
+
+def get_tts_cache():
+    """Instancia compartida (una por proceso: bot y web usan el mismo directorio)."""
+    global _cache
+    if _cache is None:
+        _cache = TTSCache(config.TTS_CACHE_DIR, config.TTS_CACHE_MAX_BYTES)
+    return _cache
+
+async def synthesize(text, voice=None, rate=None, pitch=None):
+    """Punto de entrada común para TTS (cogs y MusicCore). Retorna la ruta del MP3."""
+    return await get_tts_cache().synthesize(text, voice, rate, pitch)
+
+def stream(text, voice=None, rate=None, pitch=None):
+    """Generador async de bytes MP3 (ver TTSCache.stream)."""
+    return get_tts_cache().stream(text, voice, rate, pitch)
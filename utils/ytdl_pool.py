@@ -0,0 +1,179 @@
+import asyncio
+import queue
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import yt_dlp
+from utils.logger import setup_logger
+
+logger = setup_logger("YTDLPool")
+
+# Campos que MusicCore realmente usa de un info dict de yt-dlp
+_COMPACT_KEYS = ('id', 'title', 'url', 'duration', 'webpage_url', 'thumbnail', 'acodec')
+
+
+class ExtractionBusy(Exception):
+    """La cola de extracción está llena y no se liberó un hueco a tiempo."""
+    pass
+
+
+class _QuietLogger(object):
+    def debug(self, msg): pass
+    def warning(self, msg): pass
+    def error(self, msg): logger.error(msg)
+
+
+def compact_info(info):
+    """
+    Reduce un info dict de yt-dlp (formats, subtítulos, etc.) a lo que consume MusicCore.
+    Mantiene la forma: {'entries': [...]} para búsquedas/playlists, dict plano para un video.
+    """
+    if not info:
+        return info
+    out = {k: info.get(k) for k in _COMPACT_KEYS if k in info}
+    if 'entries' in info:
+        out['entries'] = [
+            {k: e.get(k) for k in _COMPACT_KEYS if k in e}
+            for e in info['entries'] if e
+        ]
+    return out
+
+
+class YTDLPool:
+    """
+    N instancias de YoutubeDL pre-construidas con las mismas opciones.
+    YoutubeDL no es seguro para uso concurrente: cada hilo toma una instancia en exclusiva.
+    """
+    def __init__(self, opts, size):
+        self.opts = opts
+        self.size = size
+        self._instances = queue.Queue()
+        for _ in range(size):
+            self._instances.put(yt_dlp.YoutubeDL(opts))
+
+    def extract_info(self, query):
+        """Bloqueante: se ejecuta dentro de un hilo del ExtractionExecutor."""
+        ytdl = self._instances.get()
+        try:
+            return ytdl.extract_info(query, download=False)
+        finally:
+            self._instances.put(ytdl)
+
+
+class ExtractionExecutor:
+    """
+    ThreadPoolExecutor dedicado para yt-dlp (no comparte el pool por defecto del loop).
+    option_sets: {'full': opts, 'flat': opts} - se crea un YTDLPool por set.
+    max_pending limita cuántas extracciones pueden estar en cola + en curso; el resto
+    espera (backpressure) hasta queue_timeout segundos y luego falla con ExtractionBusy.
+    """
+    backend = "thread"
+
+    def __init__(self, option_sets, workers=4, instances=4, max_pending=32, queue_timeout=15):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_pending)
+        self._start(option_sets, instances)
+
+        # Contadores
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.busy_seconds = 0.0 # Tiempo total de extracción (para comparar backends)
+
+    def _start(self, option_sets, instances):
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ytdl")
+        self._pools = {name: YTDLPool(opts, instances) for name, opts in option_sets.items()}
+
+    async def _submit(self, pool_name, query):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._pools[pool_name].extract_info, query)
+
+    async def extract(self, pool_name, query):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            logger.error(f"Cola de extracción llena ({self.max_pending}), rechazando: {query}")
+            raise ExtractionBusy(f"Extraction queue full ({self.max_pending} pending)")
+
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            return await self._submit(pool_name, query)
+        finally:
+            self.busy_seconds += time.perf_counter() - start
+            self.pending -= 1
+            self.completed += 1
+            self._slots.release()
+
+    def stats(self):
+        return {
+            'backend': self.backend,
+            'workers': self.workers,
+            'pending': self.pending,
+            'max_pending': self.max_pending,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'avg_ms': int(self.busy_seconds * 1000 / self.completed) if self.completed else 0
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# --- Process Backend ---
+# Estado por proceso worker: {pool_name: YoutubeDL}
+_worker_ytdls = {}
+
+def _init_worker(option_sets):
+    for name, opts in option_sets.items():
+        opts = dict(opts, logger=_QuietLogger())
+        _worker_ytdls[name] = yt_dlp.YoutubeDL(opts)
+
+def _worker_extract(pool_name, query):
+    # Compactar dentro del worker: solo viaja por el pipe lo necesario
+    return compact_info(_worker_ytdls[pool_name].extract_info(query, download=False))
+
+
+class ProcessExtractionExecutor(ExtractionExecutor):
+    """
+    Igual que ExtractionExecutor, pero la extracción corre en procesos de larga vida
+    (fuera del GIL del gateway de Discord / FastAPI). Cada proceso tiene sus propios
+    YoutubeDL y devuelve dicts compactos (ver compact_info).
+    """
+    backend = "process"
+
+    def _start(self, option_sets, instances):
+        # El logger no es picklable: cada worker pone el suyo
+        self._option_sets = {name: {k: v for k, v in opts.items() if k != 'logger'} for name, opts in option_sets.items()}
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            # spawn: no heredar hilos/sockets del proceso padre (discord.py, uvicorn)
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self._option_sets,)
+        )
+
+    async def _submit(self, pool_name, query):
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            return await loop.run_in_executor(executor, _worker_extract, pool_name, query)
+        except BrokenProcessPool:
+            # Un worker murió (OOM, segfault...): recrear el pool para las siguientes peticiones.
+            # Solo si nadie lo recreó ya: las demás peticiones rotas no deben matar el pool nuevo.
+            if self._executor is executor:
+                logger.error("Process pool roto, recreando workers de extracción...")
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._start(self._option_sets, 1)
+            raise
+
+
+def create_extractor(backend, option_sets, **kwargs):
+    """Crea el executor de extracción según config ('thread' | 'process')."""
+    if backend == "process":
+        return ProcessExtractionExecutor(option_sets, **kwargs)
+    return ExtractionExecutor(option_sets, **kwargs)
@@ -1,18 +1,26 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from pydantic import BaseModel
 import asyncio
+import json
+import re
 from utils.music_core import MusicCore
 from utils import database
 from utils import ai_core 
+from utils import tts
+from utils import ai_client
+from utils import chat_context
+from utils.cache import TTLCache
 from utils.logger import setup_logger
 import config
 
 # Setup
 app = FastAPI(title="Asuka Web", description="Personal Spotify Clone")
 logger = setup_logger("WebAPI")
+# Antes de MusicCore: sus caches persistentes se cargan de cache_entries al construirse
+database.ensure_db()
 core = MusicCore()
 
 # CORS
@@ -26,6 +34,11 @@ app.add_middleware(
 
 # Constants
 WEB_USER_ID = 999999 # ID Dummy para el usuario web
+VIDEO_ID_RE = re.compile(r"[A-Za-z0-9_-]{11}")
+TTS_KEY_RE = re.compile(r"[0-9a-f]{64}")
+
+# Intros de radio pendientes de sonar: {tts_key: texto}. El navegador las pide en streaming.
+pending_intros = TTLCache(max_entries=256, ttl=1800)
 
 # Models
 class PlaylistCreate(BaseModel):
@@ -43,10 +56,32 @@ async def search(q: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/resolve")
-async def resolve_stream(q: str, request: Request):
-    """Resuelve un título o búsqueda a una URL de stream."""
+async def resolve_stream(request: Request, q: str = "", id: str | None = None):
+    """
+    Resuelve un título o búsqueda a una URL de stream.
+    id: ID de YouTube (viene en /api/search). Si está, se resuelve ese video sin volver a buscar.
+    """
+    if id and not VIDEO_ID_RE.fullmatch(id):
+        raise HTTPException(status_code=400, detail="Invalid video id")
+    if not q and not id:
+        raise HTTPException(status_code=400, detail="Missing q or id")
+
     try:
-        data = await core.get_stream_url(q)
+        cached = core.local_audio(q, video_id=id)
+        if cached:
+            # Archivo en la cache de audio: el navegador lo pide a /api/audio/<id>, sin pasar por YouTube
+            data = {
+                'id': cached['video_id'],
+                'title': cached['title'] or q,
+                'url': f"/api/audio/{cached['video_id']}",
+                'duration': cached['duration'] or 0,
+                'webpage_url': f"https://www.youtube.com/watch?v={cached['video_id']}",
+                'thumbnail': f"https://i.ytimg.com/vi/{cached['video_id']}/hqdefault.jpg",
+                'acodec': "opus"
+            }
+        else:
+            # La reproducción se cuenta en /api/played (el prefetch también resuelve y puede saltarse)
+            data = await core.get_stream_url(q, video_id=id)
         if not data:
             raise HTTPException(status_code=404, detail="Not found")
             
@@ -62,14 +97,44 @@ async def resolve_stream(q: str, request: Request):
              logger.error(f"Failed to log history: {log_err}")
              
         return data
+    except HTTPException as he:
+        raise he
     except Exception as e:
         logger.error(f"Resolve error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-        return data
-    except Exception as e:
-        logger.error(f"Resolve error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+class PlayedTrack(BaseModel):
+    id: str
+    title: str | None = None
+    duration: float | None = None
+
+@app.post("/api/played")
+def track_played(track: PlayedTrack):
+    """El navegador empezó a reproducir este video: cuenta para la cache de audio (min_plays)."""
+    if not VIDEO_ID_RE.fullmatch(track.id):
+        raise HTTPException(status_code=400, detail="Invalid video id")
+    core.audio_cache.record_play(track.id, track.title, int(track.duration) if track.duration else None)
+    return {"status": "ok"}
+
+@app.get("/api/audio/{video_id}")
+def cached_audio(video_id: str):
+    """Sirve un archivo de la cache de audio (Opus/Ogg)."""
+    if not VIDEO_ID_RE.fullmatch(video_id):
+        raise HTTPException(status_code=400, detail="Invalid video id")
+    cached = database.get_cached_audio(video_id)
+    if not cached or not os.path.exists(cached['path']):
+        raise HTTPException(status_code=404, detail="Not cached")
+    return FileResponse(cached['path'], media_type="audio/ogg")
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    """Contadores de hits/misses/evictions de las caches de MusicCore."""
+    return core.cache_stats()
+
+@app.get("/api/ai/stats")
+def ai_stats():
+    """Contadores de llamadas a Gemini (latencia media, errores, timeouts, reintentos)."""
+    return ai_client.stats()
 
 # --- Chat Persistence ---
 class ChatMessage(BaseModel):
@@ -83,12 +148,12 @@ async def chat_interaction(ctx: ChatMessage, request: Request):
         uid_str = request.headers.get("X-Asuka-UID", str(WEB_USER_ID))
         user_id = int(uid_str) if uid_str.isdigit() else WEB_USER_ID
 
-        # 1. Save User Message
-        database.add_chat_message(user_id, "user", ctx.message)
-
-        # 2. Load History from DB (Context)
+        # 1. Load Context from DB (resumen + ventana reciente con presupuesto de tokens)
         # We ignore ctx.history from frontend to ensure consistency
-        db_history = database.get_chat_history(user_id, limit=20) 
+        db_history = await chat_context.build_context(user_id)
+
+        # 2. Save User Message (después: el mensaje nuevo va aparte, no en el historial)
+        database.add_chat_message(user_id, "user", ctx.message)
         
         # 3. Generate Response
         response = await ai_core.generate_response(ctx.message, db_history) # ai_core expects history format?
@@ -101,6 +166,43 @@ async def chat_interaction(ctx: ChatMessage, request: Request):
         logger.error(f"Chat Error: {e}")
         return {"response": "Error cerebral... inténtalo de nuevo."}
 
+@app.post("/api/chat/stream")
+async def chat_stream(ctx: ChatMessage, request: Request):
+    """
+    Como /api/chat, pero la respuesta llega por Server-Sent Events:
+    - data: {"delta": "..."}         (un trozo de texto)
+    - event: done / data: {"response": "..."} (texto completo, ya guardado en la DB)
+    - event: error / data: {"response": "..."}
+    """
+    uid_str = request.headers.get("X-Asuka-UID", str(WEB_USER_ID))
+    user_id = int(uid_str) if uid_str.isdigit() else WEB_USER_ID
+
+    # Contexto ANTES de guardar el mensaje nuevo (se manda aparte, no duplicado)
+    db_history = await chat_context.build_context(user_id)
+    database.add_chat_message(user_id, "user", ctx.message)
+
+    def sse(payload, event=None):
+        head = f"event: {event}\n" if event else ""
+        return f"{head}data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    async def events():
+        parts = []
+        try:
+            async for text in ai_core.stream_response(ctx.message, db_history):
+                parts.append(text)
+                yield sse({"delta": text})
+        except Exception as e:
+            logger.error(f"Chat Stream Error: {e}")
+            yield sse({"response": "Error cerebral... inténtalo de nuevo."}, event="error")
+            return
+
+        # Solo se persiste la respuesta completa
+        response = "".join(parts)
+        database.add_chat_message(user_id, "model", response)
+        yield sse({"response": response}, event="done")
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get("/api/chat/history")
 def get_chat_history_endpoint(request: Request):
     try:
@@ -187,7 +289,6 @@ class RadioContext(BaseModel):
 
 @app.post("/api/radio/next")
 async def next_radio_song(ctx: RadioContext, request: Request):
-    import os
     try:
         # 1. Use Frontend History...
         recent = ctx.history[-5:] if ctx.history else []
@@ -205,12 +306,15 @@ async def next_radio_song(ctx: RadioContext, request: Request):
              logger.error(f"Failed to fetch DB history: {db_e}")
              older = ctx.history[:-5] if len(ctx.history) > 5 else []
 
-        data = await core.generate_radio_content(recent, older, is_start=ctx.is_start, mood=ctx.mood, enable_intros=ctx.enable_intros)
+        # El audio de la intro no se sintetiza aquí: el navegador lo pide en streaming (/api/tts/stream)
+        data = await core.generate_radio_content(recent, older, is_start=ctx.is_start, mood=ctx.mood,
+                                                 enable_intros=ctx.enable_intros, synthesize_intro=False)
         
-        # Convert absolute path to URL for audio
-        if data['intro_audio']:
-             filename = os.path.basename(data['intro_audio'])
-             data['intro_audio_url'] = f"/temp/{filename}"
+        intro_text = data.get('intro_text')
+        if intro_text and data.get('song_data') and config.ANNOUNCER_MODE == "FULL":
+             key = tts.tts_key(intro_text, config.TTS_VOICE, config.TTS_RATE, config.TTS_PITCH)
+             pending_intros.set(key, intro_text)
+             data['intro_audio_url'] = f"/api/tts/stream/{key}"
         
         return data
     except Exception as e:
@@ -218,6 +322,17 @@ async def next_radio_song(ctx: RadioContext, request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/tts/stream/{key}")
+async def stream_tts(key: str):
+    """Audio de una intro de radio, servido por chunks a medida que EdgeTTS lo genera."""
+    if not TTS_KEY_RE.fullmatch(key):
+        raise HTTPException(status_code=400, detail="Invalid key")
+    text = pending_intros.get(key)
+    if text is None:
+        raise HTTPException(status_code=404, detail="Unknown intro")
+    return StreamingResponse(tts.stream(text), media_type="audio/mpeg")
+
+
 class PlaylistImport(BaseModel):
     name: str
     url: str
@@ -465,11 +580,13 @@ app.mount("/", StaticFiles(directory="static", html=True), name="static")
 # Startup Event
 @app.on_event("startup")
 async def startup_event():
-    try:
-        database.ensure_db()
-        logger.info("Web API Started.")
-    except Exception as e:
-        logger.error(f"Startup error: {e}")
+    logger.info("Web API Started.")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    core.extractor.shutdown() # No dejar workers de extracción huérfanos
+    # Cerrar el pool hace checkpoint del WAL sobre memory.db
+    database.close_pool()
 
 if __name__ == "__main__":
     import uvicorn